@@ -0,0 +1,47 @@
+import datetime
+
+from django.contrib import admin
+
+from ixxy_admin_utils.list_filters import DateFieldListFilterOrNull, makeRangeFieldListFilter
+
+from .models import Article, Author
+
+try:
+    from import_export.admin import ExportMixin
+except ImportError:
+    ExportMixin = object
+
+
+WORD_COUNT_RANGES = [
+    ('Less than 1000', None, 1000),
+    ('1K to 5K', 1000, 5000),
+    ('5K to 10K', 5000, 10000),
+    ('At least 10K', 10000, None),
+]
+
+CREATED_RANGES = [
+    ('Last day', datetime.timedelta(days=-1), None),
+    ('Last week', datetime.timedelta(days=-7), None),
+    ('Last year', datetime.timedelta(days=-365), None),
+    ('Older', None, datetime.timedelta(days=-365)),
+]
+
+
+class ArticleAdmin(ExportMixin, admin.ModelAdmin):
+    list_display = ['title', 'word_count', 'created']
+    list_filter = [
+        ('word_count', makeRangeFieldListFilter(WORD_COUNT_RANGES, nullable=True)),
+        ('created', makeRangeFieldListFilter(CREATED_RANGES, nullable=True)),
+        ('published', DateFieldListFilterOrNull),
+    ]
+
+
+class CountingArticleAdmin(ArticleAdmin):
+    list_filter = [
+        ('word_count', makeRangeFieldListFilter(WORD_COUNT_RANGES, nullable=True, show_counts=True)),
+        ('created', makeRangeFieldListFilter(CREATED_RANGES, nullable=True, show_counts=True)),
+    ]
+
+
+admin.site.register(Author)
+admin.site.register(Article, ArticleAdmin)
@@ -0,0 +1,26 @@
+from django.db import models
+
+from ixxy_admin_utils.custom_fields import BooleanTimeStampField
+from ixxy_admin_utils.model_mixins import AdminUrlMixin, BooleanTimeStampModelMixin
+
+
+class Author(models.Model):
+    name = models.CharField(max_length=100)
+
+    def __str__(self):
+        return self.name
+
+
+class Article(BooleanTimeStampModelMixin, AdminUrlMixin, models.Model):
+    title = models.CharField(max_length=100)
+    author = models.ForeignKey(Author, null=True, on_delete=models.CASCADE)
+    word_count = models.IntegerField(default=0)
+    created = models.DateTimeField(null=True, db_index=True)
+    published = BooleanTimeStampField(null=True, blank=True)
+    reviewed = BooleanTimeStampField(null=True, blank=True)
+
+    def __str__(self):
+        return self.title
+
+    def get_absolute_url(self):
+        return '/articles/{}/'.format(self.pk)
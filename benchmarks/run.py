@@ -0,0 +1,357 @@
+"""Benchmarks for ixxy_admin_utils against an in-memory SQLite database.
+
+Usage:
+
+    python benchmarks/run.py --rows 1000,100000,1000000 --output results.json
+    python benchmarks/run.py --compare old_results.json new_results.json
+
+Each benchmark records the number of queries, the wall time and the peak memory traced by tracemalloc.
+Benchmarks that need an optional package which isn't installed (import_export, admin_tools, linkcheck)
+are recorded as skipped. Use --only or --skip with benchmark names to run a subset."""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from importlib import import_module
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [BENCHMARKS_DIR, os.path.dirname(BENCHMARKS_DIR)]
+
+POPULATE_BATCH_SIZE = 10000
+PER_OBJECT_SAMPLE_SIZE = 1000
+AUTHOR_COUNT = 100
+DASHBOARD_MODULE_COUNT = 15
+
+
+def is_installed(module_name):
+    try:
+        import_module(module_name)
+    except ImportError:
+        return False
+    return True
+
+
+def configure():
+    import django
+    from django.conf import settings
+
+    optional_apps = []
+    if is_installed('admin_tools') and is_installed('linkcheck'):
+        optional_apps = ['admin_tools', 'admin_tools.dashboard', 'linkcheck']
+    if is_installed('import_export'):
+        optional_apps.append('import_export')
+    settings.configure(
+        DEBUG=False,
+        SECRET_KEY='benchmarks',
+        USE_TZ=True,
+        ALLOWED_HOSTS=['*'],
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        INSTALLED_APPS=optional_apps + [
+            'django.contrib.admin',
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'django.contrib.sessions',
+            'ixxy_admin_utils',
+            'bench_app',
+        ],
+        ROOT_URLCONF='bench_app.urls',
+        TEMPLATES=[{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'APP_DIRS': True,
+            'OPTIONS': {'context_processors': ['django.template.context_processors.request']},
+        }],
+        STATIC_URL='/static/',
+    )
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', run_syncdb=True, verbosity=0)
+
+
+def populate(rows):
+    from django.db import connection
+    from django.utils import timezone
+    from bench_app.models import Article, Author
+
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {}'.format(Article._meta.db_table))
+        cursor.execute('DELETE FROM {}'.format(Author._meta.db_table))
+
+    Author.objects.bulk_create([Author(pk=i + 1, name='Author {}'.format(i)) for i in range(AUTHOR_COUNT)])
+    now = timezone.now()
+    for batch_start in range(0, rows, POPULATE_BATCH_SIZE):
+        Article.objects.bulk_create([
+            Article(
+                pk=i + 1,
+                title='Article {}'.format(i),
+                author_id=i % AUTHOR_COUNT + 1,
+                word_count=(i * 37) % 20000,
+                created=now - datetime.timedelta(hours=i % 10000) if i % 11 else None,
+                published=now - datetime.timedelta(days=i % 30) if i % 3 else None,
+            )
+            for i in range(batch_start, min(batch_start + POPULATE_BATCH_SIZE, rows))
+        ])
+
+
+def measure(name, rows, func):
+    from django.db import connection
+    from ixxy_admin_utils.instrumentation import QueryCounter
+
+    queries_log, force_debug_cursor = connection.queries_log, connection.force_debug_cursor
+    # Only the last query is kept so big exports aren't capped at the log's 9000 queries
+    connection.queries_log, connection.force_debug_cursor = QueryCounter(maxlen=1), True
+    try:
+        tracemalloc.start()
+        start = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - start
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        query_count = connection.queries_log.count
+    finally:
+        connection.queries_log, connection.force_debug_cursor = queries_log, force_debug_cursor
+    return {
+        'benchmark': name,
+        'rows': rows,
+        'status': 'ok',
+        'queries': query_count,
+        'seconds': round(seconds, 6),
+        'peak_memory_bytes': peak_memory,
+    }
+
+
+def get_superuser():
+    from django.contrib.auth.models import User
+    user = User.objects.filter(username='benchmarks').first()
+    return user or User.objects.create_superuser('benchmarks', 'benchmarks@example.com', 'benchmarks')
+
+
+def get_request(path='/'):
+    from django.test import RequestFactory
+    request = RequestFactory().get(path)
+    request.user = get_superuser()
+    return request
+
+
+def changelist(admin_class, querystring=''):
+    from django.contrib import admin
+    from bench_app.models import Article
+
+    def run():
+        model_admin = admin_class(Article, admin.site)
+        model_admin.changelist_view(get_request('/admin/bench_app/article/' + querystring)).render()
+    return run
+
+
+def requires(*module_names):
+    def decorator(func):
+        func.requires = module_names
+        return func
+    return decorator
+
+
+def bench_changelist_range_filters():
+    from bench_app.admin import ArticleAdmin
+    return changelist(ArticleAdmin)
+
+
+def bench_changelist_range_filters_show_counts():
+    from bench_app.admin import CountingArticleAdmin
+    return changelist(CountingArticleAdmin)
+
+
+def bench_changelist_range_filter_selected():
+    from bench_app.admin import ArticleAdmin
+    return changelist(ArticleAdmin, '?word_count__gte=1000&word_count__lt=5000')
+
+
+def bench_changelist_date_or_null_filter_selected():
+    from bench_app.admin import ArticleAdmin
+    return changelist(ArticleAdmin, '?published__isnull=True')
+
+
+@requires('import_export')
+def bench_xlsx_export_action():
+    from django.contrib import admin
+    from ixxy_admin_utils.admin_actions import xlsx_export_action
+    from bench_app.admin import ArticleAdmin
+    from bench_app.models import Article
+
+    def run():
+        xlsx_export_action(ArticleAdmin(Article, admin.site), get_request(), Article.objects.all())
+    return run
+
+
+def streaming_export(file_format):
+    from django.contrib import admin
+    from ixxy_admin_utils.admin_actions import streaming_export_action
+    from bench_app.admin import ArticleAdmin
+    from bench_app.models import Article
+
+    def run():
+        response = streaming_export_action(file_format)(
+            ArticleAdmin(Article, admin.site),
+            get_request(),
+            Article.objects.all(),
+        )
+        for chunk in response.streaming_content:
+            pass
+    return run
+
+
+@requires('import_export', 'openpyxl')
+def bench_streaming_xlsx_export_action():
+    return streaming_export('xlsx')
+
+
+@requires('import_export')
+def bench_streaming_csv_export_action():
+    return streaming_export('csv')
+
+
+def bench_admin_url_change_link_per_row():
+    from bench_app.models import Article
+
+    def run():
+        for article in Article.objects.all()[:PER_OBJECT_SAMPLE_SIZE]:
+            article.change_link()
+    return run
+
+
+def bench_admin_url_get_change_links():
+    from bench_app.models import Article
+
+    def run():
+        Article.get_change_links(list(Article.objects.all()[:PER_OBJECT_SAMPLE_SIZE]))
+    return run
+
+
+def bench_boolean_timestamp_clean():
+    from bench_app.models import Article
+
+    def run():
+        for article in Article.objects.all()[:PER_OBJECT_SAMPLE_SIZE]:
+            article.published = True
+            article.reviewed = False
+            article.clean_fields(exclude=['author', 'created'])
+    return run
+
+
+@requires('admin_tools', 'linkcheck')
+def bench_dashboard_modules():
+    from django.contrib.auth.models import Group, User
+    from ixxy_admin_utils.dashboard_modules import GroupCheckingLinkList, PermCheckingLinkList
+
+    user = User.objects.filter(username='editor').first()
+    if user is None:
+        user = User.objects.create_user('editor', 'editor@example.com', 'editor', is_staff=True)
+        user.groups.add(Group.objects.create(name='Editors'))
+
+    def run():
+        request = get_request()
+        request.user = User.objects.get(pk=user.pk)
+        children = [('Link', '/')]
+        modules = [
+            GroupCheckingLinkList('Group {}'.format(i), required_group='Editors', children=children)
+            for i in range(DASHBOARD_MODULE_COUNT)
+        ] + [
+            PermCheckingLinkList('Perm {}'.format(i), required_perms=['auth.change_user'], children=children)
+            for i in range(DASHBOARD_MODULE_COUNT)
+        ]
+        for module in modules:
+            module.init_with_context({'request': request})
+    return run
+
+
+BENCHMARKS = [
+    (name[len('bench_'):], func) for name, func in sorted(globals().items())
+    if name.startswith('bench_') and callable(func)
+]
+
+
+def get_git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'],
+            cwd=BENCHMARKS_DIR,
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(row_counts, only=None, skip=None):
+    import django
+    configure()
+    results = []
+    for rows in row_counts:
+        populate(rows)
+        for name, benchmark in BENCHMARKS:
+            if (only and name not in only) or (skip and name in skip):
+                continue
+            missing = [module for module in getattr(benchmark, 'requires', ()) if not is_installed(module)]
+            if missing:
+                results.append({'benchmark': name, 'rows': rows, 'status': 'skipped', 'missing': missing})
+                continue
+            result = measure(name, rows, benchmark())
+            results.append(result)
+            print('{benchmark:<45} {rows:>9} rows {seconds:>10.4f}s {queries:>6} queries '
+                  '{peak_memory_bytes:>12} bytes'.format(**result))
+    return {
+        'revision': get_git_revision(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'timestamp': datetime.datetime.utcnow().isoformat(),
+        'results': results,
+    }
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = dict(((r['benchmark'], r['rows']), r) for r in json.load(f)['results'] if r['status'] == 'ok')
+    with open(new_path) as f:
+        new = json.load(f)['results']
+    for result in new:
+        previous = old.get((result['benchmark'], result['rows']))
+        if result['status'] != 'ok' or previous is None:
+            continue
+        print('{:<45} {:>9} rows  time x{:.2f}  queries {:+d}  memory x{:.2f}'.format(
+            result['benchmark'],
+            result['rows'],
+            result['seconds'] / previous['seconds'] if previous['seconds'] else 0,
+            result['queries'] - previous['queries'],
+            float(result['peak_memory_bytes']) / previous['peak_memory_bytes'] if previous['peak_memory_bytes'] else 0,
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='1000', help='Comma separated row counts, e.g. 1000,100000,1000000')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--only', help='Comma separated benchmark names to run')
+    parser.add_argument('--skip', help='Comma separated benchmark names to leave out')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Compare two results files')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run_benchmarks(
+        [int(rows) for rows in args.rows.split(',')],
+        only=args.only.split(',') if args.only else None,
+        skip=args.skip.split(',') if args.skip else None,
+    )
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+default_app_config = 'ixxy_admin_utils.apps.IxxyAdminUtilsConfig'
@@ -1,8 +1,41 @@
-from django.http import HttpResponse
-from import_export.formats import base_formats
+import csv
+import hashlib
+import itertools
+import tempfile
+from wsgiref.util import FileWrapper
 
+from django import forms
+from django.contrib.admin import helpers
+from django.contrib.admin.utils import get_fields_from_path
+from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from django.utils.encoding import force_text
+from django.utils.text import capfirst
 
+from . import export_formats
+from .instrumentation import instrumented
+from .model_mixins import stamp, unstamp
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # Streaming xlsx exports fall back to csv without openpyxl
+    Workbook = None
+
+
+STREAMING_EXPORT_CHUNK_SIZE = 2000
+PROJECTED_EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+PROJECTED_EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/octet-stream',
+    'zip': 'application/zip',
+}
+
+
+@instrumented('xlsx_export_action')
 def xlsx_export_action(modeladmin, request, queryset):
+    from import_export.formats import base_formats
 
     formats = modeladmin.get_export_formats()
     file_format = base_formats.XLSX()
@@ -18,4 +51,287 @@ def xlsx_export_action(modeladmin, request, queryset):
         modeladmin.get_export_filename(file_format),
     )
     return response
-xlsx_export_action.short_description = "Export selected rows to Excel"
\ No newline at end of file
+xlsx_export_action.short_description = "Export selected rows to Excel"
+
+
+class _Echo(object):
+
+    """File-like object that hands back whatever is written to it
+    so csv.writer can be used to build a streaming response"""
+
+    def write(self, value):
+        return value
+
+
+def _iterate_queryset(queryset, chunk_size):
+    # chunk_size was only added to iterator() in Django 2.0
+    try:
+        return queryset.iterator(chunk_size=chunk_size)
+    except TypeError:
+        return queryset.iterator()
+
+
+def _get_export_resource(modeladmin, request):
+    resource_class = modeladmin.get_export_resource_class()
+    if hasattr(modeladmin, 'get_export_resource_kwargs'):
+        return resource_class(**modeladmin.get_export_resource_kwargs(request))
+    return resource_class()
+
+
+def _export_rows(resource, queryset, chunk_size):
+    """Yields the header row followed by one row per object without loading the whole queryset"""
+    yield resource.get_export_headers()
+    for obj in _iterate_queryset(queryset, chunk_size):
+        yield resource.export_resource(obj)
+
+
+def _stream_delimited(rows, delimiter):
+    writer = csv.writer(_Echo(), delimiter=delimiter)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _get_export_format(file_format):
+    # import_export is only needed by the export actions so don't import it until one runs
+    from import_export.formats import base_formats
+    if file_format == 'xlsx':
+        return base_formats.XLSX()
+    elif file_format == 'tsv':
+        return base_formats.TSV()
+    return base_formats.CSV()
+
+
+def _write_xlsx(rows, fileobj):
+    # A write-only workbook flushes each row to disk so memory use stays flat
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    for row in rows:
+        worksheet.append(row)
+    workbook.save(fileobj)
+
+
+def streaming_export_action(file_format='xlsx', chunk_size=STREAMING_EXPORT_CHUNK_SIZE):
+
+    """A factory for export actions that stream the response instead of
+    building the whole file in memory. Use with an import_export ExportMixin admin.
+
+    file_format can be 'xlsx', 'csv' or 'tsv'. xlsx needs openpyxl and
+    falls back to csv when it isn't installed.
+    The workbook is written to a temporary file and streamed from there as xlsx
+    can't be sent before it's complete. csv and tsv are streamed row by row.
+
+    Example Usage:
+
+    actions = [streaming_export_action('xlsx', chunk_size=5000)]
+    """
+
+    if file_format == 'xlsx' and Workbook is None:
+        file_format = 'csv'
+
+    def export_action(modeladmin, request, queryset):
+        resource = _get_export_resource(modeladmin, request)
+        rows = _export_rows(resource, queryset, chunk_size)
+        export_format = _get_export_format(file_format)
+        if file_format == 'xlsx':
+            export_file = tempfile.TemporaryFile()
+            _write_xlsx(rows, export_file)
+            export_file.seek(0)
+            streaming_content = FileWrapper(export_file)
+        else:
+            streaming_content = _stream_delimited(rows, '\t' if file_format == 'tsv' else ',')
+        response = StreamingHttpResponse(
+            streaming_content,
+            content_type=export_format.get_content_type(),
+        )
+        response['Content-Disposition'] = 'attachment; filename=%s' % (
+            modeladmin.get_export_filename(export_format),
+        )
+        return response
+
+    export_action.short_description = "Export selected rows to {}".format(
+        'Excel' if file_format == 'xlsx' else file_format.upper()
+    )
+    export_action.__name__ = str('streaming_{}_export_action'.format(file_format))
+    return export_action
+
+
+xlsx_streaming_export_action = streaming_export_action('xlsx')
+
+
+def background_export_action(file_format='xlsx', chunk_size=STREAMING_EXPORT_CHUNK_SIZE):
+
+    """A factory for export actions that hand the export over to a background job
+    and redirect to a status page with a download link once the file is ready.
+    The ModelAdmin needs both import_export's ExportMixin and BackgroundExportMixin.
+    See export_jobs for configuring the executor.
+
+    Example Usage:
+
+    actions = [background_export_action('xlsx')]
+    """
+
+    if file_format == 'xlsx' and Workbook is None:
+        file_format = 'csv'
+
+    def export_action(modeladmin, request, queryset):
+        from .export_jobs import start_export_job
+        job_id = start_export_job(modeladmin, request, queryset, file_format, chunk_size)
+        return HttpResponseRedirect(modeladmin.get_export_job_status_url(job_id))
+
+    export_action.short_description = "Export selected rows to {} in the background".format(
+        'Excel' if file_format == 'xlsx' else file_format.upper()
+    )
+    export_action.__name__ = str('background_{}_export_action'.format(file_format))
+    return export_action
+
+
+def stamp_action(field_name, short_description=None):
+
+    """A factory for actions that switch a BooleanTimeStampField on for the selected rows
+    in a single UPDATE. Rows that are already on keep their original timestamp.
+
+    Example Usage:
+
+    actions = [stamp_action('published'), unstamp_action('published')]
+    """
+
+    def action(modeladmin, request, queryset):
+        updated = stamp(queryset, field_name)
+        modeladmin.message_user(request, '{} rows marked as {}'.format(updated, field_name))
+
+    action.short_description = short_description or 'Mark selected rows as {}'.format(field_name)
+    action.__name__ = str('stamp_{}_action'.format(field_name))
+    return action
+
+
+def unstamp_action(field_name, short_description=None):
+
+    """A factory for actions that switch a BooleanTimeStampField off for the selected rows
+    in a single UPDATE"""
+
+    def action(modeladmin, request, queryset):
+        updated = unstamp(queryset, field_name)
+        modeladmin.message_user(request, '{} rows marked as not {}'.format(updated, field_name))
+
+    action.short_description = short_description or 'Mark selected rows as not {}'.format(field_name)
+    action.__name__ = str('unstamp_{}_action'.format(field_name))
+    return action
+
+
+class ProjectedExportForm(forms.Form):
+
+    columns = forms.MultipleChoiceField(widget=forms.CheckboxSelectMultiple)
+    file_format = forms.ChoiceField(label='Format')
+
+    def __init__(self, column_choices, format_choices, *args, **kwargs):
+        super(ProjectedExportForm, self).__init__(*args, **kwargs)
+        self.fields['columns'].choices = column_choices
+        self.fields['columns'].initial = [column for column, label in column_choices]
+        self.fields['file_format'].choices = format_choices
+
+
+def _get_column_label(model, column):
+    return capfirst(' '.join(force_text(field.verbose_name) for field in get_fields_from_path(model, column)))
+
+
+def projected_export_action(columns=None, formats=PROJECTED_EXPORT_FORMATS, shard_size=None, processes=None,
+                            chunk_size=STREAMING_EXPORT_CHUNK_SIZE, name=None, short_description=None):
+
+    """A factory for export actions that ask which columns and format to export
+    then fetch only those columns with values_list(). Related fields can be given as paths
+    which are joined in the same query. No import_export resource is needed.
+
+    columns defaults to the model's concrete fields. formats can include
+    'csv', 'jsonl' and 'parquet' (which needs pyarrow and is left out without it).
+    Set shard_size to split exports with more rows than that into files of shard_size rows.
+    The shards are serialized in a process pool of processes workers (the number of CPUs by default)
+    and returned zipped together. Up to processes + 1 shards are held in memory at once
+    so keep shard_size * (processes + 1) rows within what a request can afford.
+
+    Actions are keyed by name so each configuration gets its own. Pass name to choose it
+    and short_description to tell several projected exports apart in the actions menu.
+
+    Example Usage:
+
+    actions = [projected_export_action(['title', 'author__name', 'published'], shard_size=50000, processes=4)]
+    """
+
+    def export_action(modeladmin, request, queryset):
+        model = modeladmin.model
+        opts = model._meta
+        column_choices = [
+            (column, _get_column_label(model, column))
+            for column in columns or [field.name for field in opts.concrete_fields]
+        ]
+        available_formats = [
+            file_format for file_format in formats
+            if file_format != 'parquet' or export_formats.get_pyarrow() is not None
+        ]
+        form = ProjectedExportForm(
+            column_choices,
+            [(file_format, file_format.upper()) for file_format in available_formats],
+            request.POST if 'post' in request.POST else None,
+        )
+        if form.is_valid():
+            file_format = form.cleaned_data['file_format']
+            selected_columns = [
+                (column, label) for column, label in column_choices
+                if column in form.cleaned_data['columns']
+            ]
+            return _projected_export_response(
+                queryset,
+                [column for column, label in selected_columns],
+                [label for column, label in selected_columns],
+                file_format,
+                '{}-{}'.format(opts.model_name, timezone.now().strftime('%Y-%m-%d')),
+            )
+        context = dict(
+            modeladmin.admin_site.each_context(request),
+            title='Export',
+            opts=opts,
+            form=form,
+            media=modeladmin.media,
+            action=export_action.__name__,
+            action_checkbox_name=helpers.ACTION_CHECKBOX_NAME,
+            selected=request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            select_across=request.POST.get('select_across') not in (None, '', '0'),
+        )
+        return TemplateResponse(request, 'admin/ixxy_admin_utils/export_columns.html', context)
+
+    @instrumented('projected_export_action')
+    def _projected_export_response(queryset, columns, headers, file_format, basename):
+        rows = _iterate_queryset(queryset.values_list(*columns), chunk_size)
+        export_file = tempfile.TemporaryFile()
+        extension = file_format
+        if shard_size:
+            shards = export_formats.shard_rows(rows, shard_size)
+            first_shard = next(shards, [])
+            second_shard = next(shards, None)
+            if second_shard is None:
+                export_file.write(export_formats.serialize_shard(file_format, columns, headers, first_shard))
+            else:
+                extension = 'zip'
+                export_formats.write_sharded_export(
+                    export_file,
+                    itertools.chain([first_shard, second_shard], shards),
+                    file_format,
+                    columns,
+                    headers,
+                    basename,
+                    processes,
+                )
+        else:
+            export_formats.WRITERS[file_format](export_file, columns, headers, rows)
+        export_file.seek(0)
+        response = StreamingHttpResponse(
+            FileWrapper(export_file),
+            content_type=PROJECTED_EXPORT_CONTENT_TYPES[extension],
+        )
+        response['Content-Disposition'] = 'attachment; filename=%s.%s' % (basename, extension)
+        return response
+
+    export_action.short_description = short_description or 'Export selected rows'
+    export_action.__name__ = str(name or 'projected_export_action_{}'.format(hashlib.md5(repr(
+        (columns and list(columns), list(formats), shard_size, processes, chunk_size)
+    ).encode('utf-8')).hexdigest()[:8]))
+    return export_action
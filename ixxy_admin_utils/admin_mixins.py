@@ -1,16 +1,35 @@
-from django.http import HttpResponseRedirect
+import os
+import sys
+
+from django.http import FileResponse, Http404, HttpResponseRedirect, JsonResponse
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.utils import flatten_fieldsets
+from django.contrib.admin.templatetags.admin_list import DOT, pagination
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR
+from django.core.exceptions import PermissionDenied
+from django.core.urlresolvers import reverse
+from django.db.models import Q
+from django.template.response import TemplateResponse
+from django.utils import six
+from django.utils.encoding import force_text
 from django.utils.translation import ugettext as _
 from .custom_fields import (
     BooleanTimeStampField,
     BooleanTimeStampFormField,
     BooleanTimeStampWidget,
 )
+from . import export_jobs
+from .instrumentation import instrumented
+from .list_filters import LazyRelatedFieldListFilter
+from .paginators import ApproximateCountPaginator, decode_keyset_cursor, encode_keyset_cursor
+
 
-try:
-    from dal_select2.widgets import ModelSelect2Multiple
-except ImportError:  # Avoid ImportError in the absence of django-autocomplete-light
-    ModelSelect2Multiple = None
+def _is_model_select2_multiple(widget):
+    # Any ModelSelect2Multiple widget means dal_select2 has already been imported
+    # so there's no need to import django-autocomplete-light or handle it being absent
+    ModelSelect2Multiple = getattr(sys.modules.get('dal_select2.widgets'), 'ModelSelect2Multiple', None)
+    return ModelSelect2Multiple is not None and isinstance(widget, ModelSelect2Multiple)
 
 
 class RedirectableAdmin(object):
@@ -43,36 +62,114 @@ class ModifyRelatedObjectAdmin(RedirectableAdmin):
     """If you use this as a mixin to your ModelAdmin then the change form will accept
         _redirect same as with RedirectableAdmin. Additionally add forms
         will also accept paramters to identify a parent object and field which will
-        be set to the newly created object before redirecting"""
+        be set to the newly created object before redirecting.
+        
+        The parent is updated with a single UPDATE of that field. Set modify_related_object_with_save = True
+        if it needs to be loaded and saved instead, for example so its save() and signals run"""
+
+    modify_related_object_with_save = False
 
+    @instrumented('ModifyRelatedObjectAdmin.response_post_save_add')
     def response_post_save_add(self, request, obj):
         if '_related_object' in request.GET:
             app_label, model_name, object_id, field_name = request.GET['_related_object'].split(' ')
+            # ContentType's manager caches this after the first lookup
             content_type = ContentType.objects.get_by_natural_key(app_label, model_name)
-            related_object = content_type.get_object_for_this_type(pk=object_id)
-            setattr(related_object, field_name, obj)
-            related_object.save()
+            if self.modify_related_object_with_save:
+                related_object = content_type.get_object_for_this_type(pk=object_id)
+                setattr(related_object, field_name, obj)
+                related_object.save()
+            else:
+                content_type.model_class()._base_manager.using(content_type._state.db).filter(
+                    pk=object_id,
+                ).update(**{field_name: obj})
         return super(ModifyRelatedObjectAdmin, self).response_post_save_add(request, obj)
 
 
-class HideAddRelatedMixin(object):
+class FormClassCacheMixin(object):
+    
+    """Set cache_form_classes = True on your ModelAdmin to build each form class once and reuse it.
+    Used by HideAddRelatedMixin and AutocompleteMixin.
+    Forms deep copy base_fields when they're instantiated so widgets are never shared between forms.
+    
+    The default key covers add vs change, the fields and exclude get_form will use, readonly fields,
+    get_form's kwargs and the permissions that decide which related object buttons are shown.
+    formfield_for_* overrides that depend on the user, like per user querysets, aren't covered:
+    don't cache those forms, or override get_form_cache_key to add what they depend on.
+    Returning None skips the cache"""
+    
+    cache_form_classes = False
+    
+    def _get_related_permissions(self, request):
+        # RelatedFieldWidgetWrapper shows the add, change and delete buttons by these
+        related_models = set(
+            field.related_model for field in self.model._meta.get_fields()
+            if field.is_relation and not field.auto_created and field.related_model is not None
+        )
+        return tuple(
+            (
+                related_admin.has_add_permission(request),
+                related_admin.has_change_permission(request),
+                related_admin.has_delete_permission(request),
+            )
+            for related_admin in (
+                self.admin_site._registry.get(model)
+                for model in sorted(related_models, key=lambda model: model._meta.label)
+            )
+            if related_admin is not None
+        )
+    
+    def get_form_cache_key(self, request, obj=None, **kwargs):
+        if not self.cache_form_classes:
+            return None
+        if 'fields' in kwargs:
+            # ModelAdmin.get_fields asks for a form with fields=None, resolving fieldsets here would recurse
+            fields = kwargs['fields']
+        else:
+            fields = flatten_fieldsets(self.get_fieldsets(request, obj))
+        exclude = self.get_exclude(request, obj) if hasattr(self, 'get_exclude') else self.exclude
+        return (
+            obj is None,
+            self.has_change_permission(request, obj),
+            None if fields is None else tuple(fields),
+            None if exclude is None else tuple(exclude),
+            tuple(self.get_readonly_fields(request, obj)),
+            repr(sorted(kwargs.items())),
+            self._get_related_permissions(request),
+        )
+    
+    def _get_cached_form(self, request, obj, kwargs, build_form):
+        cache_key = self.get_form_cache_key(request, obj, **kwargs)
+        if cache_key is None:
+            return build_form()
+        form_classes = self.__dict__.setdefault('_form_class_cache', {})
+        if cache_key not in form_classes:
+            form_classes[cache_key] = build_form()
+        return form_classes[cache_key]
+
+
+class HideAddRelatedMixin(FormClassCacheMixin):
     
     """ModelAdmin mixin that disables the green 'add related object' plus icon
     for any fields listed in hide_add_related_fields
     Usage: hide_add_related_fields = ['user', 'group']
     Alternately if there is a property 'show_add_related_fields' then this works as a whitelist"""
 
+    @instrumented('HideAddRelatedMixin.get_form')
     def get_form(self, request, obj=None, **kwargs):
-        form = super(HideAddRelatedMixin, self).get_form(request, obj, **kwargs)
-        if getattr(self, 'show_add_related_fields', None) is not None:
-            for field in form.base_fields.keys():
-                if field not in self.show_add_related_fields:
+        
+        def build_form():
+            form = super(HideAddRelatedMixin, self).get_form(request, obj, **kwargs)
+            if getattr(self, 'show_add_related_fields', None) is not None:
+                for field in form.base_fields.keys():
+                    if field not in self.show_add_related_fields:
+                        form.base_fields[field].widget.can_add_related = False
+            else:
+                for field in getattr(self, 'hide_add_related_fields', []):
                     form.base_fields[field].widget.can_add_related = False
-        else:
-            for field in getattr(self, 'hide_add_related_fields', []):
-                form.base_fields[field].widget.can_add_related = False
+            return form
 
-        return form
+        return self._get_cached_form(request, obj, kwargs, build_form)
 
 
 class DisableDeletionMixin(object):
@@ -85,36 +182,111 @@ class LongListFilterMixin(object):
     """Automatically reduce the amount of space taken up by very long filters.
     It hides the list of options and replaces it with an input field that autocompletes.
     
-    Unlike a true autocomplete this won't save queries or speed up page load
-    but it's a quick and dirty improvement to the UI"""
+    On its own this won't save queries or speed up page load
+    but it's a quick and dirty improvement to the UI.
+    Configure it with long_list_filter_show, long_list_filter_threshold and long_list_filter_height,
+    see long_list_filter.js.
     
-    @property
-    def media(self):
-        
-        cdn_base = 'https://ajax.googleapis.com/ajax/libs/'
-        
-        show = getattr(self, 'long_list_filter_show', 'active')
-        threshold = getattr(self, 'long_list_filter_threshold', '300')
-        height = getattr(self, 'long_list_filter_height', '100')
-        
-        media = super(LongListFilterMixin, self).media
-        media.add_js([
-            '{}jqueryui/1.11.4/jquery-ui.min.js'.format(cdn_base),
-            'js/ixxy_admin_utils/long_list_filter.js?show={}&threshold={}&height={}'.format(
-                show,
-                threshold,
-                height,
+    For related fields with too many values to render at all, list them in long_list_filter_lazy
+    mapping the filter's field to the field on the related model to search and display:
+    
+    long_list_filter_lazy = {'author': 'name'}
+    
+    These filters render without options and the autocomplete fetches matches
+    from a paginated JSON endpoint instead, a page at a time.
+    They're chosen by name rather than by long_list_filter_threshold as that's the height
+    long_list_filter.js measures in the browser, which the server can't know without
+    rendering the options it's trying to avoid"""
+    
+    long_list_filter_lazy = {}
+    long_list_filter_page_size = 20
+    
+    def get_list_filter(self, request):
+        list_filter = super(LongListFilterMixin, self).get_list_filter(request)
+        return [
+            (item, LazyRelatedFieldListFilter)
+            if isinstance(item, six.string_types) and item in self.long_list_filter_lazy else item
+            for item in list_filter
+        ]
+    
+    def get_urls(self):
+        from django.conf.urls import url
+        info = self.model._meta.app_label, self.model._meta.model_name
+        urlpatterns = [
+            url(
+                r'^long-list-filter/(?P<field_path>\w+)/$',
+                self.admin_site.admin_view(self.long_list_filter_choices_view),
+                name='%s_%s_long_list_filter_choices' % info,
             ),
-        ])
-        media.add_css({
-            'all': [
-                '{}jqueryui/1.11.4/themes/smoothness/jquery-ui.css'.format(cdn_base)
+        ]
+        return urlpatterns + super(LongListFilterMixin, self).get_urls()
+    
+    def get_long_list_filter_choices_url(self, field_path):
+        return reverse(
+            'admin:%s_%s_long_list_filter_choices' % (self.model._meta.app_label, self.model._meta.model_name),
+            args=(field_path,),
+            current_app=self.admin_site.name,
+        )
+    
+    @instrumented('LongListFilterMixin.long_list_filter_choices_view')
+    def long_list_filter_choices_view(self, request, field_path):
+        if field_path not in self.long_list_filter_lazy:
+            raise Http404
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        text_path = '{}__{}'.format(field_path, self.long_list_filter_lazy[field_path])
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        offset = (page - 1) * self.long_list_filter_page_size
+        
+        queryset = self.get_queryset(request).filter(**{'{}__isnull'.format(field_path): False})
+        if request.GET.get('q'):
+            queryset = queryset.filter(**{'{}__icontains'.format(text_path): request.GET['q']})
+        # Fetch one extra row to find out if there's another page
+        choices = list(
+            queryset.order_by(text_path).values_list(field_path, text_path).distinct()[
+                offset:offset + self.long_list_filter_page_size + 1
             ]
+        )
+        return JsonResponse({
+            'results': [
+                {'value': force_text(value), 'text': force_text(text)}
+                for value, text in choices[:self.long_list_filter_page_size]
+            ],
+            'more': len(choices) > self.long_list_filter_page_size,
         })
-        return media
+    
+    def get_changelist(self, request, **kwargs):
+        ChangeList = super(LongListFilterMixin, self).get_changelist(request, **kwargs)
+        
+        class LongListFilterChangeList(ChangeList):
+            def get_filters(self, request):
+                filters = super(LongListFilterChangeList, self).get_filters(request)
+                # Wrap each filter's own template in a div carrying the options for long_list_filter.js
+                for spec in filters[0]:
+                    spec.long_list_filter_template = spec.template
+                    spec.long_list_filter_show = getattr(self.model_admin, 'long_list_filter_show', 'active')
+                    spec.long_list_filter_threshold = getattr(self.model_admin, 'long_list_filter_threshold', '300')
+                    spec.long_list_filter_height = getattr(self.model_admin, 'long_list_filter_height', '100')
+                    spec.template = 'admin/ixxy_admin_utils/long_list_filter.html'
+                return filters
+        
+        return LongListFilterChangeList
+    
+    @property
+    def media(self):
+        # The script's url never changes so build the Media once per class
+        admin_class = type(self)
+        if '_long_list_filter_media' not in admin_class.__dict__:
+            media = super(LongListFilterMixin, self).media
+            media.add_js(['js/ixxy_admin_utils/long_list_filter.js'])
+            admin_class._long_list_filter_media = media
+        return admin_class._long_list_filter_media
 
 
-class AutocompleteMixin(object):
+class AutocompleteMixin(FormClassCacheMixin):
     
     """Reduces the amount of boilerplate needed by autocomplete-light.
     Define a property on your ModelAdmin called 'autocomplete_widgets'.
@@ -127,6 +299,15 @@ class AutocompleteMixin(object):
     }
     """
     
+    @instrumented('AutocompleteMixin.get_form')
+    def get_form(self, request, obj=None, **kwargs):
+        return self._get_cached_form(
+            request,
+            obj,
+            kwargs,
+            lambda: super(AutocompleteMixin, self).get_form(request, obj, **kwargs),
+        )
+    
     def formfield_for_dbfield(self, db_field, **kwargs):
         # Automatically assign autocomplete widgets based on an autocomplete_widgets dict
         if db_field.name in getattr(self, 'autocomplete_widgets', {}):
@@ -140,12 +321,52 @@ class AutocompleteMixin(object):
             request,
             **kwargs
         )
-        if isinstance(form_field.widget, ModelSelect2Multiple):
+        if _is_model_select2_multiple(form_field.widget):
             unwanted_msg = _('Hold down "Control", or "Command" on a Mac, to select more than one.')
             form_field.help_text = form_field.help_text.replace(unwanted_msg, '')
         return form_field
 
 
+class AdminLinksMixin(object):
+    
+    """For models using AdminUrlMixin. Adds admin_change_link and admin_view_link
+    which can be used in list_display in place of the model's change_link and view_link.
+    The links for the whole page are built in one pass once the results are fetched.
+    Override prefetch_admin_links to add anything get_absolute_url needs"""
+    
+    def get_changelist(self, request, **kwargs):
+        ChangeList = super(AdminLinksMixin, self).get_changelist(request, **kwargs)
+        
+        class AdminLinksChangeList(ChangeList):
+            def get_results(self, request):
+                super(AdminLinksChangeList, self).get_results(request)
+                self.model_admin.prefetch_admin_links(request, self.result_list)
+        
+        return AdminLinksChangeList
+    
+    @instrumented('AdminLinksMixin.prefetch_admin_links')
+    def prefetch_admin_links(self, request, objs):
+        list_display = self.get_list_display(request)
+        if 'admin_change_link' in list_display:
+            change_links = self.model.get_change_links(objs)
+            for obj in objs:
+                obj._admin_change_link = change_links[obj.pk]
+        if 'admin_view_link' in list_display:
+            view_links = self.model.get_view_links(objs)
+            for obj in objs:
+                obj._admin_view_link = view_links[obj.pk]
+    
+    def admin_change_link(self, obj):
+        return getattr(obj, '_admin_change_link', None) or obj.change_link()
+    admin_change_link.allow_tags = True
+    admin_change_link.short_description = ''
+    
+    def admin_view_link(self, obj):
+        return getattr(obj, '_admin_view_link', None) or obj.view_link()
+    admin_view_link.allow_tags = True
+    admin_view_link.short_description = ''
+
+
 class BooleanTimeStampMixin(object):
     
     """If you this with any model containing BooleanTimeStampField
@@ -160,3 +381,265 @@ class BooleanTimeStampMixin(object):
             kwargs.pop('request')
             db_field.formfield(**kwargs)
         return super(BooleanTimeStampMixin, self).formfield_for_dbfield(db_field, **kwargs)
+
+
+class BackgroundExportMixin(object):
+
+    """Adds the status and download views used by admin_actions.background_export_action.
+    Use alongside import_export's ExportMixin"""
+
+    def get_urls(self):
+        from django.conf.urls import url
+        info = self.model._meta.app_label, self.model._meta.model_name
+        urlpatterns = [
+            url(
+                r'^export-jobs/(?P<job_id>[0-9a-f]{32})/$',
+                self.admin_site.admin_view(self.export_job_status_view),
+                name='%s_%s_export_job_status' % info,
+            ),
+            url(
+                r'^export-jobs/(?P<job_id>[0-9a-f]{32})/download/$',
+                self.admin_site.admin_view(self.export_job_download_view),
+                name='%s_%s_export_job_download' % info,
+            ),
+        ]
+        return urlpatterns + super(BackgroundExportMixin, self).get_urls()
+
+    def _get_export_job_url(self, url_name, job_id):
+        return reverse(
+            'admin:%s_%s_%s' % (self.model._meta.app_label, self.model._meta.model_name, url_name),
+            args=(job_id,),
+            current_app=self.admin_site.name,
+        )
+
+    def get_export_job_status_url(self, job_id):
+        return self._get_export_job_url('export_job_status', job_id)
+
+    def _get_export_job_or_404(self, request, job_id):
+        job = export_jobs.get_export_job(job_id)
+        # Only the user who started an export gets to see it
+        if job is None or job.get('user_id') != request.user.pk:
+            raise Http404
+        return job
+
+    def export_job_status_view(self, request, job_id):
+        job = self._get_export_job_or_404(request, job_id)
+        context = dict(
+            self.admin_site.each_context(request),
+            title='Export',
+            opts=self.model._meta,
+            job=job,
+            finished=job['state'] in (export_jobs.DONE, export_jobs.FAILED),
+            download_url=self._get_export_job_url('export_job_download', job_id),
+        )
+        return TemplateResponse(request, 'admin/ixxy_admin_utils/export_job_status.html', context)
+
+    def export_job_download_view(self, request, job_id):
+        job = self._get_export_job_or_404(request, job_id)
+        if job['state'] != export_jobs.DONE:
+            raise Http404
+        response = FileResponse(export_jobs.get_export_storage().open(job['path'], 'rb'))
+        response['Content-Disposition'] = 'attachment; filename=%s' % os.path.basename(job['path'])
+        return response
+
+
+IXXY_CHANGE_LIST_TEMPLATE = 'admin/ixxy_admin_utils/change_list.html'
+
+
+def _use_ixxy_change_list_template(response):
+    # Our template extends whichever template the changelist would have used
+    # so it works alongside other mixins that set change_list_template
+    if isinstance(response, TemplateResponse) and response.template_name != IXXY_CHANGE_LIST_TEMPLATE:
+        response.context_data['ixxy_change_list_base_template'] = response.resolve_template(response.template_name)
+        response.template_name = IXXY_CHANGE_LIST_TEMPLATE
+    return response
+
+
+EXACT_COUNT_VAR = '_exact_count'
+
+
+class ApproximateCountMixin(object):
+
+    """Avoids an exact COUNT(*) on changelists with more than approximate_count_threshold results.
+    On PostgreSQL the planner's estimate is used. Elsewhere set approximate_count_cache_timeout
+    and the exact count is cached for that many seconds, otherwise it's counted as usual.
+    The paginator then shows 'About N results' with a link to count exactly.
+    Counts from makeRangeFieldListFilter(show_counts=True) are left out while the total is approximate"""
+
+    approximate_count_threshold = 100000
+    approximate_count_cache_timeout = None
+    # The unfiltered total would be another full count
+    show_full_result_count = False
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return ApproximateCountPaginator(
+            queryset,
+            per_page,
+            orphans,
+            allow_empty_first_page,
+            threshold=self.approximate_count_threshold,
+            cache_timeout=self.approximate_count_cache_timeout,
+            exact=EXACT_COUNT_VAR in request.GET,
+        )
+
+    def get_changelist(self, request, **kwargs):
+        ChangeList = super(ApproximateCountMixin, self).get_changelist(request, **kwargs)
+
+        class ApproximateCountChangeList(ChangeList):
+            def get_filters_params(self, params=None):
+                lookup_params = super(ApproximateCountChangeList, self).get_filters_params(params)
+                lookup_params.pop(EXACT_COUNT_VAR, None)
+                return lookup_params
+
+            def get_results(self, request):
+                super(ApproximateCountChangeList, self).get_results(request)
+                self.result_count_is_approximate = getattr(self.paginator, 'is_approximate', False)
+                if self.result_count_is_approximate:
+                    self.exact_count_url = self.get_query_string({EXACT_COUNT_VAR: 1})
+                    page_range = list(pagination(self)['page_range'])
+                    # The estimate may be low so keep offering the next page while there are more rows
+                    if self.page_num + 1 >= self.paginator.num_pages:
+                        # Django's own range can already run past the estimate around the current page
+                        last_listed = max(page for page in page_range if page != DOT)
+                        first_extra = max(last_listed + 1, self.page_num - 3)
+                        if first_extra > last_listed + 1:
+                            page_range.append(DOT)
+                        page_range.extend(range(first_extra, self.page_num + 1))
+                        if self.page_num + 1 > last_listed and self.paginator.page(self.page_num + 1).has_next():
+                            page_range.append(self.page_num + 1)
+                    self.approximate_page_range = page_range
+
+        return ApproximateCountChangeList
+
+    def changelist_view(self, request, extra_context=None):
+        response = super(ApproximateCountMixin, self).changelist_view(request, extra_context)
+        return _use_ixxy_change_list_template(response)
+
+
+KEYSET_AFTER_VAR = '_after'
+KEYSET_BEFORE_VAR = '_before'
+
+
+class KeysetPaginationMixin(object):
+
+    """Replaces page numbers with previous and next links that seek from the last row shown
+    so deep pages are as fast as the first. Set keyset_field to an indexed, non-null column,
+    with a '-' prefix for descending order. The pk breaks ties.
+
+    Rows are ordered by keyset_field unless the user sorts by a column, in which case
+    the usual page numbers are used. The cursor is kept in the changelist's url
+    so preserved filters and _redirect urls come back to the same position
+    even if rows have been added or removed since"""
+
+    keyset_field = '-pk'
+
+    def _get_keyset_ordering(self):
+        descending = self.keyset_field.startswith('-')
+        field_name = self.keyset_field.lstrip('-')
+        pk_name = self.model._meta.pk.name
+        if field_name in ('pk', pk_name):
+            return descending, field_name, []
+        return descending, field_name, [('-' if descending else '') + pk_name]
+
+    def get_changelist(self, request, **kwargs):
+        ChangeList = super(KeysetPaginationMixin, self).get_changelist(request, **kwargs)
+
+        class KeysetPaginationChangeList(ChangeList):
+
+            @property
+            def keyset_pagination(self):
+                return ORDER_VAR not in self.params
+
+            def get_filters_params(self, params=None):
+                lookup_params = super(KeysetPaginationChangeList, self).get_filters_params(params)
+                lookup_params.pop(KEYSET_AFTER_VAR, None)
+                lookup_params.pop(KEYSET_BEFORE_VAR, None)
+                return lookup_params
+
+            def get_query_string(self, new_params=None, remove=None):
+                # Changing the filters or sorting starts again from the beginning
+                new_params = dict(new_params or {})
+                new_params.setdefault(KEYSET_AFTER_VAR, None)
+                new_params.setdefault(KEYSET_BEFORE_VAR, None)
+                return super(KeysetPaginationChangeList, self).get_query_string(new_params, remove)
+
+            def get_ordering(self, request, queryset):
+                if not self.keyset_pagination:
+                    return super(KeysetPaginationChangeList, self).get_ordering(request, queryset)
+                return [self.model_admin.keyset_field] + self.model_admin._get_keyset_ordering()[2]
+
+            def _get_cursor(self, var):
+                field_name = self.model_admin.keyset_field.lstrip('-')
+                try:
+                    return decode_keyset_cursor(
+                        self.params[var],
+                        self.lookup_opts.pk if field_name == 'pk' else self.lookup_opts.get_field(field_name),
+                        self.lookup_opts.pk,
+                    )
+                except ValueError:
+                    raise IncorrectLookupParameters
+
+            def _seek(self, queryset, cursor, forwards):
+                descending, field_name, tiebreak = self.model_admin._get_keyset_ordering()
+                value, pk = cursor
+                lookup = 'lt' if descending == forwards else 'gt'
+                condition = Q(**{'%s__%s' % (field_name, lookup): value})
+                if tiebreak:
+                    condition |= Q(**{field_name: value, 'pk__%s' % lookup: pk})
+                return queryset.filter(condition)
+
+            def _get_page_url(self, var, row):
+                return self.get_query_string({
+                    var: encode_keyset_cursor(row[1], row[0]),
+                    PAGE_VAR: None,
+                })
+
+            def get_results(self, request):
+                if not self.keyset_pagination:
+                    return super(KeysetPaginationChangeList, self).get_results(request)
+                field_name = self.model_admin._get_keyset_ordering()[1]
+                forwards = KEYSET_BEFORE_VAR not in self.params
+                queryset = self.queryset
+                if KEYSET_AFTER_VAR in self.params:
+                    queryset = self._seek(queryset, self._get_cursor(KEYSET_AFTER_VAR), True)
+                elif KEYSET_BEFORE_VAR in self.params:
+                    queryset = self._seek(queryset, self._get_cursor(KEYSET_BEFORE_VAR), False).reverse()
+                # Fetch one extra row to find out if there's another page
+                rows = list(queryset.values_list('pk', field_name)[:self.list_per_page + 1])
+                has_more = len(rows) > self.list_per_page
+                rows = rows[:self.list_per_page]
+                if not forwards:
+                    rows.reverse()
+
+                if forwards:
+                    has_previous, has_next = KEYSET_AFTER_VAR in self.params, has_more
+                else:
+                    # The cursor row itself comes next
+                    has_previous, has_next = has_more, True
+                self.keyset_previous_url = self.keyset_next_url = self.keyset_first_url = None
+                if rows and has_previous:
+                    self.keyset_previous_url = self._get_page_url(KEYSET_BEFORE_VAR, rows[0])
+                if rows and has_next:
+                    self.keyset_next_url = self._get_page_url(KEYSET_AFTER_VAR, rows[-1])
+                if KEYSET_AFTER_VAR in self.params or KEYSET_BEFORE_VAR in self.params:
+                    self.keyset_first_url = self.get_query_string({PAGE_VAR: None})
+
+                # Keep result_list a queryset for list_editable and the actions
+                self.result_list = self.queryset.filter(pk__in=[pk for pk, value in rows])
+                # The search results and 'Select all' show the size of the whole result.
+                # Counted by the admin's paginator so ApproximateCountMixin can estimate it
+                paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+                self.result_count = paginator.count
+                self.keyset_count_is_approximate = getattr(paginator, 'is_approximate', False)
+                self.show_full_result_count = False
+                self.show_admin_actions = True
+                self.full_result_count = None
+                self.can_show_all = False
+                self.multi_page = False
+                self.paginator = None
+
+        return KeysetPaginationChangeList
+
+    def changelist_view(self, request, extra_context=None):
+        response = super(KeysetPaginationMixin, self).changelist_view(request, extra_context)
+        return _use_ixxy_change_list_template(response)
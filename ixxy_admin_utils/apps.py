@@ -0,0 +1,13 @@
+from django.apps import AppConfig, apps
+
+
+class IxxyAdminUtilsConfig(AppConfig):
+
+    name = 'ixxy_admin_utils'
+    verbose_name = 'Ixxy Admin Utils'
+
+    def ready(self):
+        # The dashboard modules need admin_tools so only load them when it's installed
+        if apps.is_installed('admin_tools.dashboard'):
+            from .dashboard_modules import connect_signals
+            connect_signals()
@@ -1,7 +1,14 @@
 from django import forms
 from django.db import models
+from django.db.models.signals import class_prepared, post_save
 from django.utils import timezone
 
+from .instrumentation import instrumented
+
+# Models declaring a BooleanTimeStampField. Their proxies and multi-table children
+# send their own post_save so they're connected as they're prepared
+_boolean_timestamp_models = set()
+
 
 class BooleanTimeStampWidget(forms.CheckboxInput):
     
@@ -44,12 +51,18 @@ class BooleanTimeStampField(models.DateTimeField):
     
     """Used in conjunction with BooleanTimeStampMixin"""
     
+    def contribute_to_class(self, cls, name, *args, **kwargs):
+        super(BooleanTimeStampField, self).contribute_to_class(cls, name, *args, **kwargs)
+        if not cls._meta.abstract:
+            _boolean_timestamp_models.add(cls)
+            _connect_snapshot_after_save(cls)
+
+    @instrumented('BooleanTimeStampField.clean')
     def clean(self, value, model_instance):
         
         saved_value = None
         if model_instance.pk:
-            saved_instance = type(model_instance).objects.get(pk=model_instance.pk)
-            saved_value = getattr(saved_instance, self.name)
+            saved_value = get_saved_boolean_timestamps(model_instance).get(self.attname)
         if value and saved_value is None:
             value = timezone.now()
         elif value and saved_value is not None:
@@ -59,3 +72,71 @@ class BooleanTimeStampField(models.DateTimeField):
         else:
             raise ValueError
         return value
+
+
+def _get_boolean_timestamp_attnames(model):
+    return [
+        field.attname for field in model._meta.concrete_fields
+        if isinstance(field, BooleanTimeStampField)
+    ]
+
+
+def snapshot_boolean_timestamps(instance, attnames=None):
+    
+    """Records the current values of instance's BooleanTimeStampFields as their saved values.
+    Called from BooleanTimeStampModelMixin.from_db and refresh_from_db and after each save"""
+    
+    snapshot = instance.__dict__.setdefault('_boolean_timestamp_snapshot', {})
+    for attname in attnames or _get_boolean_timestamp_attnames(type(instance)):
+        # Deferred fields aren't in __dict__ and are left to get_saved_boolean_timestamps
+        if attname in instance.__dict__:
+            snapshot[attname] = instance.__dict__[attname]
+        else:
+            snapshot.pop(attname, None)
+
+
+def get_saved_boolean_timestamps(instance):
+    
+    """Returns a dict of the saved values of instance's BooleanTimeStampFields.
+    Anything not already in the snapshot is fetched in a single query and cached on the instance"""
+    
+    snapshot = instance.__dict__.setdefault('_boolean_timestamp_snapshot', {})
+    missing = [
+        attname for attname in _get_boolean_timestamp_attnames(type(instance))
+        if attname not in snapshot
+    ]
+    if missing:
+        saved = type(instance)._default_manager.filter(pk=instance.pk).values(*missing).first() or {}
+        for attname in missing:
+            snapshot[attname] = saved.get(attname)
+    return snapshot
+
+
+def _snapshot_after_save(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    attnames = _get_boolean_timestamp_attnames(sender)
+    if update_fields is not None:
+        attnames = [
+            attname for attname in attnames
+            if sender._meta.get_field(attname).name in update_fields
+        ]
+        if not attnames:
+            return
+    snapshot_boolean_timestamps(instance, attnames)
+
+
+def _connect_snapshot_after_save(model):
+    post_save.connect(
+        _snapshot_after_save,
+        sender=model,
+        dispatch_uid='boolean_timestamp_snapshot_{}'.format(id(model)),
+    )
+
+
+def _connect_subclass_snapshot(sender, **kwargs):
+    if not sender._meta.abstract and issubclass(sender, tuple(_boolean_timestamp_models)):
+        _connect_snapshot_after_save(sender)
+
+
+class_prepared.connect(_connect_subclass_snapshot, dispatch_uid='boolean_timestamp_subclass_snapshot')
@@ -1,6 +1,19 @@
 from dal_select2_tagging.widgets import TaggingSelect2
 from django import VERSION
-from tagging.utils import parse_tag_input
+from django.utils.encoding import force_text
+from django.utils.html import format_html_join
+
+try:
+    from functools import lru_cache
+except ImportError:  # Python 2
+    from django.utils.lru_cache import lru_cache
+
+
+@lru_cache(maxsize=1024)
+def _parse_tags(tag_string):
+    from tagging.utils import parse_tag_input
+    # Tuples so the cached result can't be modified
+    return tuple(parse_tag_input(tag_string))
 
 
 class IxxyTaggingSelect2(TaggingSelect2):
@@ -14,12 +27,10 @@ class IxxyTaggingSelect2(TaggingSelect2):
 
         selected_choices = args[selected_choices_arg]
 
-        if selected_choices:
-            selected_choices = parse_tag_input(selected_choices)
-
-        options = [
-            '<option value="%s" selected="selected">%s</option>' % (c, c)
-            for c in selected_choices
-        ]
+        tags = _parse_tags(force_text(selected_choices)) if selected_choices else ()
 
-        return '\n'.join(options)
\ No newline at end of file
+        return format_html_join(
+            '\n',
+            '<option value="{}" selected="selected">{}</option>',
+            ((tag, tag) for tag in tags),
+        )
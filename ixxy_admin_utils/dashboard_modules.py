@@ -1,48 +1,259 @@
+import copy
+
 from admin_tools.dashboard.modules import LinkList
+from admin_tools.dashboard.utils import get_index_dashboard
+from django.apps import apps
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
-from linkcheck.views import get_status_message
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.http import Http404, HttpResponse
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.html import format_html
+
+from .instrumentation import instrumented
+
+USER_ACCESS_GENERATION_KEY = 'ixxy_dashboard_user_access_generation'
+LINKCHECK_STATUS_CACHE_KEY = 'ixxy_linkcheck_status_message'
+RENDER_DEFERRED_CONTEXT_KEY = 'ixxy_render_deferred_module'
+
+
+def _get_user_access(user, kind, load):
+    # Optionally cache across requests for IXXY_DASHBOARD_ACCESS_CACHE_TIMEOUT seconds.
+    # Any change to groups or permissions starts a new generation of keys
+    timeout = getattr(settings, 'IXXY_DASHBOARD_ACCESS_CACHE_TIMEOUT', 0)
+    if not timeout:
+        return load()
+    cache_key = 'ixxy_dashboard_user_access:{}:{}:{}'.format(
+        cache.get(USER_ACCESS_GENERATION_KEY, 0),
+        kind,
+        user.pk,
+    )
+    value = cache.get(cache_key)
+    if value is None:
+        value = load()
+        cache.set(cache_key, value, timeout)
+    return value
+
+
+@instrumented('GroupCheckingLinkList.get_user_group_names')
+def get_user_group_names(request):
+    """The names of request.user's groups. Loaded once per request and shared by all the modules"""
+    if not hasattr(request, '_ixxy_group_names'):
+        user = request.user
+        request._ixxy_group_names = _get_user_access(
+            user,
+            'groups',
+            lambda: set(user.groups.values_list('name', flat=True)),
+        )
+    return request._ixxy_group_names
+
+
+@instrumented('PermCheckingLinkList.get_user_permissions')
+def get_user_permissions(request):
+    """request.user's permissions. Loaded once per request and shared by all the modules"""
+    if not hasattr(request, '_ixxy_permissions'):
+        user = request.user
+        request._ixxy_permissions = _get_user_access(user, 'permissions', user.get_all_permissions)
+    return request._ixxy_permissions
+
+
+def user_has_perms(request, perms):
+    """request.user.has_perms(perms), memoised on the request. Permissions already in
+    get_user_permissions are granted without another lookup. Anything else still goes through
+    has_perms so backends that only implement has_perm are consulted"""
+    perms = frozenset(perms)
+    user = request.user
+    if user.is_active and perms <= get_user_permissions(request):
+        return True
+    if not hasattr(request, '_ixxy_has_perms'):
+        request._ixxy_has_perms = {}
+    if perms not in request._ixxy_has_perms:
+        request._ixxy_has_perms[perms] = user.has_perms(perms)
+    return request._ixxy_has_perms[perms]
+
+
+def invalidate_user_access_cache(**kwargs):
+    try:
+        cache.incr(USER_ACCESS_GENERATION_KEY)
+    except ValueError:
+        cache.set(USER_ACCESS_GENERATION_KEY, 1, None)
+
+
+def _user_access_m2m_changed(sender, instance, action, model, **kwargs):
+    if action.startswith('post_') and (
+        isinstance(instance, (Group, Permission)) or model in (Group, Permission)
+    ):
+        invalidate_user_access_cache()
+
+
+class DeferredModuleMixin(object):
+
+    """Pass deferred_key='some-key' to a module and the dashboard will only render a placeholder for it.
+    The content is fetched from deferred_dashboard_module_view once the page has loaded
+    so a slow module doesn't hold up the whole dashboard.
+    The key must be unique within the index dashboard and ixxy_admin_utils.urls must be included.
+    deferred_max_age sets how long the browser may cache the content"""
+
+    def __init__(self, title=None, **kwargs):
+        self.deferred_key = kwargs.pop('deferred_key', None)
+        self.deferred_max_age = kwargs.pop('deferred_max_age', 60)
+        super(DeferredModuleMixin, self).__init__(title, **kwargs)
+
+    def init_with_context(self, context):
+        # A module can be shared between dashboards and requests so put back
+        # what the last placeholder replaced before rendering it again
+        original = self.__dict__.pop('_deferred_original', None)
+        if original is not None:
+            self.children, self.pre_content, self.post_content = original
+        if self.deferred_key and not context.get(RENDER_DEFERRED_CONTEXT_KEY):
+            self._deferred_original = (self.children, self.pre_content, self.post_content)
+            self.pre_content = format_html(
+                '<span class="ixxy-deferred-module" data-url="{}">Loading...</span>'
+                '<script type="text/javascript" src="{}"></script>',
+                reverse('ixxy_deferred_dashboard_module', args=(self.deferred_key,)),
+                static('js/ixxy_admin_utils/deferred_dashboard_modules.js'),
+            )
+            self.children = []
+            self.post_content = None
+        else:
+            super(DeferredModuleMixin, self).init_with_context(context)
+
+
+def _find_deferred_module(modules, key):
+    for module in modules:
+        if getattr(module, 'deferred_key', None) == key:
+            return module
+        # Recurse into groups of modules
+        found = _find_deferred_module(getattr(module, 'children', None) or [], key)
+        if found is not None:
+            return found
+    return None
 
 
-class PermCheckingLinkList(LinkList):
+@staff_member_required
+def deferred_dashboard_module_view(request, key):
+    context = {'request': request}
+    dashboard = get_index_dashboard(context)
+    dashboard.init_with_context(context)
+    module = _find_deferred_module(dashboard.children, key)
+    if module is None:
+        raise Http404
+    # The module may be shared between requests so work on a copy
+    module = copy.deepcopy(module)
+    module.init_with_context(dict(context, **{RENDER_DEFERRED_CONTEXT_KEY: True}))
+    response = HttpResponse(render_to_string(module.template, {'module': module}, request=request))
+    patch_cache_control(response, private=True, max_age=module.deferred_max_age)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+class PermCheckingLinkList(DeferredModuleMixin, LinkList):
 
     def __init__(self, title=None, **kwargs):
         self.required_perms = kwargs.pop('required_perms', [])
         super(PermCheckingLinkList, self).__init__(title, **kwargs)
 
+    @instrumented('PermCheckingLinkList.init_with_context')
     def init_with_context(self, context):
         super(PermCheckingLinkList, self).init_with_context(context)
         if self.required_perms:
             user = context['request'].user
-            if not user.is_superuser and not user.has_perms(self.required_perms):
+            if not user.is_superuser and not user_has_perms(context['request'], self.required_perms):
                 self.children = None
                 self.pre_content = None
                 self.post_content = None
 
 
-class GroupCheckingLinkList(LinkList):
+class GroupCheckingLinkList(DeferredModuleMixin, LinkList):
 
     def __init__(self, title=None, **kwargs):
         self.required_group = kwargs.pop('required_group', None)
         super(GroupCheckingLinkList, self).__init__(title, **kwargs)
 
+    @instrumented('GroupCheckingLinkList.init_with_context')
     def init_with_context(self, context):
         super(GroupCheckingLinkList, self).init_with_context(context)
         if self.required_group:
             user = context['request'].user
-            if not user.is_superuser and not context['request'].user.groups.filter(name=self.required_group):
+            if not user.is_superuser and self.required_group not in get_user_group_names(context['request']):
                 self.children = None
                 self.pre_content = None
                 self.post_content = None
 
 
-linkcheck_perm_checking_dashboard_module = PermCheckingLinkList(
-    title="Linkchecker",
-    pre_content=get_status_message,
-    children=(
-        {'title': 'Valid links', 'url': reverse('linkcheck_report') + '?filters=show_valid'},
-        {'title': 'Broken links', 'url': reverse('linkcheck_report')},
-        {'title': 'Untested links', 'url': reverse('linkcheck_report') + '?filters=show_unchecked'},
-        {'title': 'Ignored links', 'url': reverse('linkcheck_report') + '?filters=ignored'},
-    ),
-    required_perms=['linkcheck.change_link'],
-)
\ No newline at end of file
+@instrumented('LinkcheckLinkList.get_linkcheck_status_message')
+def get_linkcheck_status_message():
+    """linkcheck's status message, cached for IXXY_LINKCHECK_STATUS_CACHE_TIMEOUT seconds
+    (default 5 minutes) or until a link or url changes, so rendering it doesn't count the link table"""
+    # linkcheck is only imported once there's a status to show
+    from linkcheck import update_lock
+    from linkcheck.views import get_status_message
+    message = cache.get(LINKCHECK_STATUS_CACHE_KEY)
+    if message is None:
+        message = get_status_message()
+        # Don't hang on to 'Still checking' for long
+        if not update_lock.locked():
+            cache.set(
+                LINKCHECK_STATUS_CACHE_KEY,
+                message,
+                getattr(settings, 'IXXY_LINKCHECK_STATUS_CACHE_TIMEOUT', 60 * 5),
+            )
+    return message
+
+
+def invalidate_linkcheck_status_message(**kwargs):
+    cache.delete(LINKCHECK_STATUS_CACHE_KEY)
+
+
+def connect_signals():
+    """Connects the receivers that invalidate the cached user access and linkcheck status.
+    Called from IxxyAdminUtilsConfig.ready so every process invalidates, not just the ones
+    that have rendered a dashboard. Safe to call more than once"""
+    m2m_changed.connect(_user_access_m2m_changed, dispatch_uid='ixxy_dashboard_user_access_m2m')
+    post_save.connect(invalidate_user_access_cache, sender=Group, dispatch_uid='ixxy_dashboard_group_saved')
+    post_delete.connect(invalidate_user_access_cache, sender=Group, dispatch_uid='ixxy_dashboard_group_deleted')
+    if not apps.is_installed('linkcheck'):
+        return
+    from linkcheck.models import Link, Url
+    for linkcheck_model in (Link, Url):
+        post_save.connect(
+            invalidate_linkcheck_status_message,
+            sender=linkcheck_model,
+            dispatch_uid='ixxy_linkcheck_status_{}_saved'.format(linkcheck_model.__name__),
+        )
+        post_delete.connect(
+            invalidate_linkcheck_status_message,
+            sender=linkcheck_model,
+            dispatch_uid='ixxy_linkcheck_status_{}_deleted'.format(linkcheck_model.__name__),
+        )
+
+
+class LinkcheckLinkList(PermCheckingLinkList):
+
+    """Links to the linkcheck reports with a summary of broken links.
+    The urls are only reversed when the dashboard is rendered"""
+
+    def __init__(self, title='Linkchecker', **kwargs):
+        kwargs.setdefault('required_perms', ['linkcheck.change_link'])
+        super(LinkcheckLinkList, self).__init__(title, **kwargs)
+
+    def init_with_context(self, context):
+        report_url = reverse('linkcheck_report')
+        # The module may be shared between requests so start from scratch each time
+        self._initialized = False
+        self.pre_content = get_linkcheck_status_message
+        self.children = [
+            {'title': 'Valid links', 'url': report_url + '?filters=show_valid'},
+            {'title': 'Broken links', 'url': report_url},
+            {'title': 'Untested links', 'url': report_url + '?filters=show_unchecked'},
+            {'title': 'Ignored links', 'url': report_url + '?filters=ignored'},
+        ]
+        super(LinkcheckLinkList, self).init_with_context(context)
+
+
+linkcheck_perm_checking_dashboard_module = LinkcheckLinkList()
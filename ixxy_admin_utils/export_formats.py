@@ -0,0 +1,145 @@
+"""Writers for admin_actions.projected_export_action
+
+Kept apart from admin_actions so the process pool's workers only import this
+and not the admin, which would need Django's apps to be set up."""
+
+import collections
+import csv
+import io
+import itertools
+import json
+import multiprocessing
+import sys
+import zipfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.encoding import force_text
+
+PARQUET_BATCH_SIZE = 2000
+CSV_BUFFER_SIZE = 64 * 1024
+
+
+def get_pyarrow():
+    # Parquet is only offered when pyarrow is installed
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def write_csv(fileobj, columns, headers, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in itertools.chain([headers], rows):
+        writer.writerow(row)
+        if buffer.tell() > CSV_BUFFER_SIZE:
+            fileobj.write(buffer.getvalue().encode('utf-8'))
+            buffer.seek(0)
+            buffer.truncate()
+    fileobj.write(buffer.getvalue().encode('utf-8'))
+
+
+def write_jsonl(fileobj, columns, headers, rows):
+    for row in rows:
+        fileobj.write(json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder).encode('utf-8'))
+        fileobj.write(b'\n')
+
+
+def _as_text(pyarrow, values):
+    return pyarrow.array([None if value is None else force_text(value) for value in values], pyarrow.string())
+
+
+def _parquet_table(pyarrow, columns, rows, schema=None):
+    arrays = []
+    for i, column in enumerate(columns):
+        values = [row[i] for row in rows]
+        field_type = schema.field(i).type if schema is not None else None
+        try:
+            array = pyarrow.array(values, field_type)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, pyarrow.ArrowNotImplementedError):
+            # Types arrow doesn't know, like UUIDs, are written as text
+            array = _as_text(pyarrow, values)
+            if field_type is not None:
+                array = array.cast(field_type)
+        arrays.append(array)
+    return pyarrow.Table.from_arrays(arrays, names=list(columns))
+
+
+def _parquet_schema(pyarrow, table):
+    # The first batch decides the schema for the whole file so leave room for later batches:
+    # a column that's all nulls so far becomes text and decimals get the maximum precision
+    fields = []
+    for field in table.schema:
+        if pyarrow.types.is_null(field.type):
+            field = pyarrow.field(field.name, pyarrow.string())
+        elif pyarrow.types.is_decimal(field.type):
+            field = pyarrow.field(field.name, pyarrow.decimal128(38, field.type.scale))
+        fields.append(field)
+    return pyarrow.schema(fields)
+
+
+def write_parquet(fileobj, columns, headers, rows):
+    # Written a batch at a time so memory use doesn't grow with the export
+    pyarrow = get_pyarrow()
+    batch = list(itertools.islice(rows, PARQUET_BATCH_SIZE))
+    schema = _parquet_schema(pyarrow, _parquet_table(pyarrow, columns, batch))
+    writer = pyarrow.parquet.ParquetWriter(fileobj, schema)
+    while True:
+        writer.write_table(_parquet_table(pyarrow, columns, batch, schema))
+        batch = list(itertools.islice(rows, PARQUET_BATCH_SIZE))
+        if not batch:
+            break
+    writer.close()
+
+
+WRITERS = {
+    'csv': write_csv,
+    'jsonl': write_jsonl,
+    'parquet': write_parquet,
+}
+
+
+def serialize_shard(file_format, columns, headers, rows):
+    """Returns one shard of an export as bytes. Runs in a worker process so only takes picklable arguments"""
+    fileobj = io.BytesIO()
+    WRITERS[file_format](fileobj, columns, headers, iter(rows))
+    return fileobj.getvalue()
+
+
+def shard_rows(rows, shard_size):
+    while True:
+        shard = list(itertools.islice(rows, shard_size))
+        if not shard:
+            return
+        yield shard
+
+
+def write_sharded_export(fileobj, shards, file_format, columns, headers, basename, processes=None):
+    """Serializes each shard in a process pool and writes them to a zip file as they finish.
+    Workers are spawned rather than forked so they don't inherit the request's database connections
+    and threads. At most one shard more than there are workers is waiting or being serialized, so
+    this process holds up to (workers + 1) * shard_size rows, plus the zip's compressed output,
+    and each worker holds a copy of its shard and the serialized bytes"""
+    from concurrent.futures import ProcessPoolExecutor
+    workers = processes or multiprocessing.cpu_count()
+    executor_kwargs = {}
+    if sys.version_info >= (3, 7):
+        executor_kwargs['mp_context'] = multiprocessing.get_context('spawn')
+    # Only fetch the next shard once a worker is about to be free for it so memory use stays bounded
+    max_pending = workers + 1
+    pending = collections.deque()
+
+    def write_next():
+        index, future = pending.popleft()
+        archive.writestr('{}-{:04d}.{}'.format(basename, index + 1, file_format), future.result())
+
+    with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED) as archive:
+        with ProcessPoolExecutor(max_workers=workers, **executor_kwargs) as executor:
+            for index, shard in enumerate(shards):
+                pending.append((index, executor.submit(serialize_shard, file_format, columns, headers, shard)))
+                if len(pending) >= max_pending:
+                    write_next()
+            while pending:
+                write_next()
@@ -0,0 +1,151 @@
+"""Background export jobs used by admin_actions.background_export_action
+
+Jobs are handed to an executor - any object with a submit(fn, *args) method.
+By default this is a thread pool. Set IXXY_EXPORT_EXECUTOR to the dotted path
+of a callable returning an executor to change it, for example a small adapter class
+whose submit() sends the arguments on to an external task queue. Avoid fork based
+process pools as the workers would inherit the request's database connections.
+
+Job state is kept in the cache and finished files are saved to the default storage
+(or IXXY_EXPORT_STORAGE). External queues need a cache and storage
+that are shared between processes."""
+
+import os
+import tempfile
+import threading
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage, get_storage_class
+from django.db import connections
+from django.utils.module_loading import import_string
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+EXPORT_JOB_CACHE_TIMEOUT = 60 * 60 * 24
+EXPORT_JOB_PROGRESS_INTERVAL = 1000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_export_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            executor_path = getattr(settings, 'IXXY_EXPORT_EXECUTOR', None)
+            if executor_path:
+                _executor = import_string(executor_path)()
+            else:
+                from concurrent.futures import ThreadPoolExecutor
+                _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'IXXY_EXPORT_WORKERS', 2))
+    return _executor
+
+
+def get_export_storage():
+    storage_path = getattr(settings, 'IXXY_EXPORT_STORAGE', None)
+    if storage_path:
+        return get_storage_class(storage_path)()
+    return default_storage
+
+
+def _job_cache_key(job_id):
+    return 'ixxy_export_job:{}'.format(job_id)
+
+
+def get_export_job(job_id):
+    return cache.get(_job_cache_key(job_id))
+
+
+def _update_export_job(job_id, **kwargs):
+    job = get_export_job(job_id) or {}
+    job.update(kwargs)
+    cache.set(_job_cache_key(job_id), job, EXPORT_JOB_CACHE_TIMEOUT)
+    return job
+
+
+def _track_progress(job_id, rows, **job):
+    # The first row is the header
+    for count, row in enumerate(rows):
+        if count and count % EXPORT_JOB_PROGRESS_INTERVAL == 0:
+            _update_export_job(job_id, rows=count, **job)
+        yield row
+
+
+def _get_thread_id():
+    return os.getpid(), threading.current_thread().ident
+
+
+def start_export_job(modeladmin, request, queryset, file_format, chunk_size):
+    from .admin_actions import _get_export_format
+    job_id = uuid.uuid4().hex
+    model = queryset.model
+    filename = modeladmin.get_export_filename(_get_export_format(file_format))
+    _update_export_job(
+        job_id,
+        state=PENDING,
+        rows=0,
+        total=None,
+        user_id=request.user.pk,
+        filename=filename,
+    )
+    # Built with the same kwargs as streaming_export_action so both export the same columns
+    resource_kwargs = {}
+    if hasattr(modeladmin, 'get_export_resource_kwargs'):
+        resource_kwargs = modeladmin.get_export_resource_kwargs(request)
+    get_export_executor().submit(
+        run_export_job,
+        job_id,
+        '{}.{}'.format(model._meta.app_label, model._meta.model_name),
+        queryset.query,
+        modeladmin.get_export_resource_class(),
+        resource_kwargs,
+        file_format,
+        chunk_size,
+        request.user.pk,
+        filename,
+        _get_thread_id(),
+    )
+    return job_id
+
+
+def run_export_job(job_id, model_label, query, resource_class, resource_kwargs, file_format, chunk_size,
+                   user_id, filename, submitted_from=None):
+    """Writes the export to a temporary file then saves it to storage.
+    Only takes picklable arguments so it can run in another process.
+    submitted_from is the process and thread that started the job"""
+    from .admin_actions import _export_rows, _stream_delimited, _write_xlsx
+    # Written with every update so the owner can still download the file if the cache entry was evicted
+    job = dict(user_id=user_id, filename=filename)
+    try:
+        queryset = apps.get_model(model_label)._default_manager.all()
+        queryset.query = query
+        total = queryset.count()
+        _update_export_job(job_id, state=RUNNING, total=total, **job)
+        rows = _track_progress(job_id, _export_rows(resource_class(**resource_kwargs), queryset, chunk_size), **job)
+        with tempfile.TemporaryFile() as export_file:
+            if file_format == 'xlsx':
+                _write_xlsx(rows, export_file)
+            else:
+                for line in _stream_delimited(rows, '\t' if file_format == 'tsv' else ','):
+                    export_file.write(line.encode('utf-8'))
+            export_file.seek(0)
+            path = get_export_storage().save(
+                'ixxy_exports/{}/{}'.format(job_id, filename),
+                File(export_file),
+            )
+        _update_export_job(job_id, state=DONE, rows=total, path=path, **job)
+    except Exception as e:
+        _update_export_job(job_id, state=FAILED, error=str(e), **job)
+        raise
+    finally:
+        # Worker threads and processes get their own connections which Django won't close for us.
+        # An executor that runs the job straight away in the request's thread is left alone
+        if _get_thread_id() != submitted_from:
+            connections.close_all()
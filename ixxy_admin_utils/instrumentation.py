@@ -0,0 +1,166 @@
+"""Opt-in timing and query counting for the code in ixxy_admin_utils
+
+Add the middleware to turn it on:
+
+    MIDDLEWARE = [
+        ...
+        'ixxy_admin_utils.instrumentation.InstrumentationMiddleware',
+    ]
+
+Every function wrapped with @instrumented(name) then records its calls, time and queries
+for the current request. The totals are:
+
+ * sent in a Server-Timing header so they show up in the browser's network panel
+ * logged at INFO to the 'ixxy_admin_utils.instrumentation' logger
+ * added to per process stats which the 'ixxy_instrumentation_stats' url returns as JSON
+
+Queries are counted as they're added to each connection's queries_log, so while a request
+is instrumented the connections log their queries as they would with DEBUG on.
+Outside an instrumented request the wrappers just call through."""
+
+import collections
+import logging
+import threading
+import time
+from functools import wraps
+
+from django.db import connections
+
+try:
+    from django.utils.deprecation import MiddlewareMixin
+except ImportError:  # Django < 1.10
+    MiddlewareMixin = object
+
+logger = logging.getLogger('ixxy_admin_utils.instrumentation')
+
+_local = threading.local()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+class QueryCounter(collections.deque):
+
+    """Stands in for a connection's queries_log. Counts every query, as the log stops growing
+    at its maxlen. Instrumented requests keep the log's entries and maxlen,
+    the benchmarks pass maxlen=1 so millions of queries don't inflate the memory figures"""
+
+    def __init__(self, queries=(), maxlen=None):
+        super(QueryCounter, self).__init__(queries, maxlen=maxlen)
+        self.count = 0
+
+    def append(self, query):
+        self.count += 1
+        super(QueryCounter, self).append(query)
+
+
+def _query_count():
+    return sum(getattr(connection.queries_log, 'count', 0) for connection in connections.all())
+
+
+def _add_record(records, name, seconds, queries):
+    record = records.setdefault(name, {'calls': 0, 'seconds': 0.0, 'queries': 0})
+    record['calls'] += 1
+    record['seconds'] += seconds
+    record['queries'] += queries
+
+
+def instrumented(name):
+
+    """Records the calls, time and queries of the wrapped function under name
+    when it runs inside an instrumented request. Nested calls are included in the outer totals.
+
+    Example Usage:
+
+    @instrumented('MyMixin.get_thing')
+    def get_thing(self):
+        ...
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            records = getattr(_local, 'records', None)
+            if records is None:
+                return func(*args, **kwargs)
+            queries = _query_count()
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _add_record(records, name, time.time() - start, _query_count() - queries)
+        return wrapper
+    return decorator
+
+
+def start_instrumentation():
+    _local.records = {}
+    _local.debug_cursors = []
+    for connection in connections.all():
+        _local.debug_cursors.append((connection, connection.force_debug_cursor, connection.queries_log))
+        connection.force_debug_cursor = True
+        connection.queries_log = QueryCounter(connection.queries_log, connection.queries_log.maxlen)
+
+
+def stop_instrumentation():
+    """Ends instrumentation for this thread and returns what was recorded by name"""
+    records = getattr(_local, 'records', None) or {}
+    for connection, force_debug_cursor, queries_log in getattr(_local, 'debug_cursors', ()):
+        connection.force_debug_cursor = force_debug_cursor
+        # Put the original log back with this request's queries in it
+        queries_log.clear()
+        queries_log.extend(connection.queries_log)
+        connection.queries_log = queries_log
+    _local.records = None
+    _local.debug_cursors = []
+    with _stats_lock:
+        for name, record in records.items():
+            stats = _stats.setdefault(name, {
+                'requests': 0,
+                'calls': 0,
+                'seconds': 0.0,
+                'queries': 0,
+                'max_seconds': 0.0,
+            })
+            stats['requests'] += 1
+            stats['calls'] += record['calls']
+            stats['seconds'] += record['seconds']
+            stats['queries'] += record['queries']
+            stats['max_seconds'] = max(stats['max_seconds'], record['seconds'])
+    return records
+
+
+def get_instrumentation_stats():
+    """Totals for this process since it started or since reset_instrumentation_stats, slowest first"""
+    with _stats_lock:
+        stats = [dict(stats, name=name) for name, stats in _stats.items()]
+    return sorted(stats, key=lambda stats: stats['seconds'], reverse=True)
+
+
+def reset_instrumentation_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def format_server_timing(records):
+    return ', '.join(
+        '{};dur={:.2f};desc="{} calls, {} queries"'.format(
+            name, record['seconds'] * 1000, record['calls'], record['queries'],
+        )
+        for name, record in sorted(records.items())
+    )
+
+
+class InstrumentationMiddleware(MiddlewareMixin):
+
+    def process_request(self, request):
+        start_instrumentation()
+
+    def process_response(self, request, response):
+        records = stop_instrumentation()
+        if records:
+            server_timing = format_server_timing(records)
+            if response.has_header('Server-Timing'):
+                server_timing = '{}, {}'.format(response['Server-Timing'], server_timing)
+            response['Server-Timing'] = server_timing
+            logger.info('%s %s %s', request.method, request.path, server_timing)
+        return response
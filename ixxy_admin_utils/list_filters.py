@@ -1,8 +1,22 @@
 import datetime
-from django.contrib.admin import FieldListFilter, DateFieldListFilter
+import hashlib
+from django.contrib.admin import FieldListFilter, DateFieldListFilter, RelatedFieldListFilter
+from django.contrib.admin.utils import get_model_from_relation, prepare_lookup_value
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import Case, Count, IntegerField, Q, Value, When
 from django.utils import timezone
+from django.utils.encoding import force_text
 from django.utils.translation import ugettext_lazy as _
 
+try:
+    from django.core.exceptions import EmptyResultSet
+except ImportError:  # Django < 1.11
+    from django.db.models.sql.datastructures import EmptyResultSet
+
+from .instrumentation import instrumented
+
 
 def custom_field_list_filter(title=None):
 
@@ -17,7 +31,34 @@ def custom_field_list_filter(title=None):
     return Wrapper
 
 
-def makeRangeFieldListFilter(lookups, nullable=False, title=None):
+def _date_bound(field, value, snap_to):
+    
+    """Turns a datetime relative to now into a bound that compares directly with the field.
+    DateTimeFields get an aware datetime floored to the start of the day or hour
+    so the lookup can use an index and the querystring stays the same until the next day or hour"""
+    
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    if not isinstance(field, models.DateTimeField):
+        return value.date().isoformat()
+    if snap_to == 'hour':
+        # The offset is the same throughout the hour so it can be kept, even in the hour repeated when DST ends
+        value = value.replace(minute=0, second=0, microsecond=0)
+    else:
+        value = value.replace(hour=0, minute=0, second=0, microsecond=0)
+        if timezone.is_aware(value):
+            # Localize again as the offset may differ at midnight if DST changed during the day.
+            # is_dst=False avoids an error where midnight is skipped or repeated, normalize then
+            # moves a skipped midnight on to the real start of the day
+            tz = timezone.get_current_timezone()
+            value = timezone.make_aware(value.replace(tzinfo=None), tz, is_dst=False)
+            if hasattr(tz, 'normalize'):
+                value = tz.normalize(value)
+    return value.isoformat()
+
+
+def makeRangeFieldListFilter(lookups, nullable=False, title=None, show_counts=False, cache_timeout=None,
+                             snap_to='day'):
     
     """Mostly based on https://djangosnippets.org/snippets/2779/
     
@@ -55,12 +96,20 @@ def makeRangeFieldListFilter(lookups, nullable=False, title=None):
            ('At least 1000', 1000, None),
        ])),
 
-    )"""
+    )
+    
+    show_counts=True adds the number of matching rows to each link. All the counts
+    come from a single aggregate query which respects the other list filters.
+    cache_timeout caches the counts for that many seconds.
+    
+    timedelta bounds on a DateTimeField are snapped to the start of the day,
+    or the start of the hour with snap_to='hour'"""
     
     class RangeFieldListFilter(FieldListFilter):
         
         def __init__(self, field, request, params, model, model_admin, field_path, title=title):
             
+            self.request = request
             self.field_generic = '%s__' % field_path
             self.range_params = dict(
                 [(k, v) for k, v in params.items()
@@ -73,31 +122,32 @@ def makeRangeFieldListFilter(lookups, nullable=False, title=None):
             
             self.links = [(_('Any'), {}), ]
             
+            now = timezone.now()
             for name, start, stop in lookups:
                 
                 # If we pass in a timedelta then assume we want date filtering
                 # relative to now
-                # TODO This only supports date not datetime
                 is_date_based = False
                 if isinstance(start, datetime.timedelta):
-                    start = timezone.now() + start
+                    start = now + start
                     is_date_based = True
                 if isinstance(stop, datetime.timedelta):
-                    stop = timezone.now() + stop
+                    stop = now + stop
                     is_date_based = True
                 
                 query_params = {}
                 
                 if is_date_based:
                     if start is not None:
-                        start = str(start.date())
+                        start = _date_bound(field, start, snap_to)
                     if stop is not None:
-                        stop = str(stop.date())
+                        stop = _date_bound(field, stop, snap_to)
 
+                # Querystring values are always text so compare them as text to find the selected link
                 if start is not None:
-                    query_params[self.lookup_kwarg_start] = start
+                    query_params[self.lookup_kwarg_start] = force_text(start)
                 if stop is not None:
-                    query_params[self.lookup_kwarg_stop] = stop
+                    query_params[self.lookup_kwarg_stop] = force_text(stop)
                 
                 self.links.append((name, query_params))
             
@@ -126,12 +176,67 @@ def makeRangeFieldListFilter(lookups, nullable=False, title=None):
                 self.lookup_kwarg_null
             ]
         
+        @instrumented('RangeFieldListFilter.get_counts')
+        def get_counts(self, cl):
+            # Counting every bucket costs as much as the count ApproximateCountMixin is avoiding
+            if getattr(cl, 'result_count_is_approximate', False):
+                return None
+            queryset = cl.root_queryset
+            lookup_params = cl.get_filters_params()
+            for spec in cl.filter_specs:
+                for param in spec.expected_parameters():
+                    lookup_params.pop(param, None)
+                if spec is not self:
+                    new_queryset = spec.queryset(self.request, queryset)
+                    # SimpleListFilters return None when nothing is selected
+                    if new_queryset is not None:
+                        queryset = new_queryset
+            # Then the rest of the querystring's lookups, such as date_hierarchy's, as ChangeList.get_queryset does
+            queryset = queryset.filter(**dict(
+                (key, prepare_lookup_value(key, value)) for key, value in lookup_params.items()
+            ))
+            # Count within the search results as well so the counts match the rows shown
+            if cl.query:
+                queryset, use_distinct = cl.model_admin.get_search_results(self.request, queryset, cl.query)
+                if use_distinct:
+                    # Counting over the join would count a row once per match
+                    queryset = cl.root_queryset.filter(pk__in=queryset.values('pk'))
+            try:
+                sql, params = queryset.query.sql_with_params()
+            except EmptyResultSet:
+                return [0] * len(self.links)
+            
+            cache_key = 'ixxy_range_counts:{}'.format(hashlib.md5(repr(
+                (sql, params, [param_dict for title, param_dict in self.links])
+            ).encode('utf-8')).hexdigest())
+            if cache_timeout:
+                counts = cache.get(cache_key)
+                if counts is not None:
+                    return counts
+            
+            aggregates = {}
+            for i, (title, param_dict) in enumerate(self.links):
+                if param_dict:
+                    aggregates['bucket_%d' % i] = Count(Case(
+                        When(Q(**param_dict), then=Value(1)),
+                        output_field=IntegerField(),
+                    ))
+                else:
+                    aggregates['bucket_%d' % i] = Count('pk')
+            results = queryset.order_by().aggregate(**aggregates)
+            counts = [results['bucket_%d' % i] for i in range(len(self.links))]
+            
+            if cache_timeout:
+                cache.set(cache_key, counts, cache_timeout)
+            return counts
+        
         def choices(self, cl):
-            for title, param_dict in self.links:
+            counts = self.get_counts(cl) if show_counts else None
+            for i, (title, param_dict) in enumerate(self.links):
                 yield {
                     'selected': self.range_params == param_dict,
                     'query_string': cl.get_query_string(param_dict, [self.field_generic]),
-                    'display': title,
+                    'display': title if counts is None else '%s (%s)' % (title, counts[i]),
                 }
     
     return RangeFieldListFilter
@@ -156,3 +261,38 @@ class DateFieldListFilterOrNull(DateFieldListFilter):
 
     def expected_parameters(self):
         return super(DateFieldListFilterOrNull, self).expected_parameters() + [self.lookup_kwarg_isnull, ]
+
+
+class LazyRelatedFieldListFilter(RelatedFieldListFilter):
+    
+    """Used by LongListFilterMixin for the fields in long_list_filter_lazy.
+    Only the selected choice is fetched and rendered. The rest are looked up on demand
+    by long_list_filter.js from the ModelAdmin's choices endpoint"""
+    
+    template = 'admin/ixxy_admin_utils/lazy_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.text_field = model_admin.long_list_filter_lazy[field_path]
+        super(LazyRelatedFieldListFilter, self).__init__(field, request, params, model, model_admin, field_path)
+        self.choices_url = model_admin.get_long_list_filter_choices_url(field_path)
+
+    def has_output(self):
+        # There's always something to search for even with no choices rendered
+        return True
+
+    @instrumented('LazyRelatedFieldListFilter.field_choices')
+    def field_choices(self, field, request, model_admin):
+        if self.lookup_val is None:
+            return []
+        other_model = get_model_from_relation(field)
+        target_name = field.target_field.name
+        try:
+            return [
+                (force_text(value), text) for value, text in
+                other_model._default_manager.filter(**{target_name: self.lookup_val}).values_list(
+                    target_name,
+                    self.text_field,
+                )[:1]
+            ]
+        except (ValueError, ValidationError):
+            return []
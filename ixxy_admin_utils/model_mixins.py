@@ -1,7 +1,34 @@
 from django.contrib.contenttypes.models import ContentType
-from django.core.urlresolvers import reverse, NoReverseMatch
+from django.core.signals import setting_changed
+from django.core.urlresolvers import get_script_prefix, get_urlconf, reverse, NoReverseMatch
+from django.db import models
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.encoding import force_text
+from django.utils.http import RFC3986_SUBDELIMS, urlquote
 from django.utils.functional import cached_property
 from django.utils.safestring import mark_safe
+from .custom_fields import BooleanTimeStampField, snapshot_boolean_timestamps
+from .instrumentation import instrumented
+
+
+# Reversed admin urls keyed on urlconf, script prefix, model and url name
+# with placeholders where the args go
+_admin_url_cache = {}
+
+
+def _admin_url_placeholder(index):
+    return 'ixxyadminurlarg{}'.format(index)
+
+
+def clear_admin_url_cache():
+    _admin_url_cache.clear()
+
+
+@receiver(setting_changed)
+def _clear_admin_url_cache_on_urlconf_change(setting, **kwargs):
+    if setting == 'ROOT_URLCONF':
+        clear_admin_url_cache()
 
 
 class AdminUrlMixin(object):
@@ -18,7 +45,7 @@ class AdminUrlMixin(object):
         )
     
     @classmethod
-    def _get_admin_url(cls, admin_url_name, args=None):
+    def _reverse_admin_url(cls, admin_url_name, args=None):
         content_type = ContentType.objects.get_for_model(cls, for_concrete_model=False)
         try:
             return cls._get_admin_url_for_content_type(content_type, admin_url_name, args)
@@ -27,6 +54,31 @@ class AdminUrlMixin(object):
             content_type = ContentType.objects.get_for_model(cls)
             return cls._get_admin_url_for_content_type(content_type, admin_url_name, args)
 
+    @classmethod
+    @instrumented('AdminUrlMixin.get_admin_url')
+    def _get_admin_url(cls, admin_url_name, args=None):
+        # Reversing is slow so do it once per model and url name with placeholders for the args
+        # then just substitute the args each time. This also remembers whether we fell back to the concrete model
+        args = args or ()
+        cache_key = (get_urlconf(), get_script_prefix(), cls, admin_url_name, len(args))
+        url = _admin_url_cache.get(cache_key)
+        if url is None:
+            try:
+                url = cls._reverse_admin_url(
+                    admin_url_name,
+                    [_admin_url_placeholder(i) for i in range(len(args))],
+                )
+            except NoReverseMatch:
+                # The url pattern may not accept our placeholders
+                return cls._reverse_admin_url(admin_url_name, args)
+            _admin_url_cache[cache_key] = url
+        for i, arg in enumerate(args):
+            url = url.replace(
+                _admin_url_placeholder(i),
+                urlquote(force_text(arg), safe=RFC3986_SUBDELIMS + str('/~:@')),
+            )
+        return url
+
     @cached_property
     def changeform_url(self):
         return self._get_admin_url('change', args=(self.pk,))
@@ -43,13 +95,85 @@ class AdminUrlMixin(object):
     def get_addform_url(cls):
         return cls._get_admin_url('add')
 
+    @staticmethod
+    def _format_view_link(url):
+        return mark_safe(u'<a href="{}" style="white-space: nowrap">View</a>'.format(url))
+
+    @staticmethod
+    def _format_change_link(url, link_text, redirect):
+        redirect_param = '?_redirect={}'.format(redirect) if redirect else ''
+        return mark_safe(u'<a href="{}{}" class="changelink">{}</a>'.format(url, redirect_param, link_text))
+
     def view_link(self):
-        return mark_safe(u'<a href="{}" style="white-space: nowrap">View</a>'.format(self.get_absolute_url()))
+        return self._format_view_link(self.get_absolute_url())
     view_link.allow_tags = True
     view_link.short_description = ''
 
     def change_link(self, link_text='Edit', redirect=None):
-        redirect_param = '?_redirect={}'.format(redirect) if redirect else ''
-        return mark_safe(u'<a href="{}{}" class="changelink">{}</a>'.format(self.changeform_url, redirect_param, link_text))
+        return self._format_change_link(self.changeform_url, link_text, redirect)
     change_link.allow_tags = True
     change_link.short_description = ''
+
+    @classmethod
+    @instrumented('AdminUrlMixin.get_change_links')
+    def get_change_links(cls, objs, link_text='Edit', redirect=None):
+        """Returns a dict mapping pk to change_link() for a list of instances or pks"""
+        return dict(
+            (pk, cls._format_change_link(cls._get_admin_url('change', args=(pk,)), link_text, redirect))
+            for pk in (obj.pk if isinstance(obj, models.Model) else obj for obj in objs)
+        )
+
+    @classmethod
+    @instrumented('AdminUrlMixin.get_view_links')
+    def get_view_links(cls, objs):
+        """Returns a dict mapping pk to view_link() for a list of instances"""
+        return dict((obj.pk, cls._format_view_link(obj.get_absolute_url())) for obj in objs)
+
+
+class BooleanTimeStampModelMixin(object):
+    
+    """Snapshots the values of any BooleanTimeStampFields as the instance is loaded
+    so BooleanTimeStampField.clean can compare against them without another query.
+    Without this mixin the saved values are fetched with one query per instance"""
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(BooleanTimeStampModelMixin, cls).from_db(db, field_names, values)
+        snapshot_boolean_timestamps(instance)
+        return instance
+    
+    def refresh_from_db(self, using=None, fields=None):
+        super(BooleanTimeStampModelMixin, self).refresh_from_db(using, fields)
+        attnames = None
+        if fields is not None:
+            attnames = [
+                field.attname for field in self._meta.concrete_fields
+                if isinstance(field, BooleanTimeStampField) and (field.name in fields or field.attname in fields)
+            ]
+            if not attnames:
+                return
+        snapshot_boolean_timestamps(self, attnames)
+
+
+def stamp(queryset, field_name):
+    """Sets a BooleanTimeStampField to now in a single UPDATE.
+    Rows that are already stamped keep their original timestamp"""
+    return queryset.filter(**{'{}__isnull'.format(field_name): True}).update(**{field_name: timezone.now()})
+
+
+def unstamp(queryset, field_name):
+    """Clears a BooleanTimeStampField in a single UPDATE"""
+    return queryset.filter(**{'{}__isnull'.format(field_name): False}).update(**{field_name: None})
+
+
+class BooleanTimeStampQuerySet(models.QuerySet):
+    
+    """Bulk versions of flipping a BooleanTimeStampField on or off.
+    Usage: objects = BooleanTimeStampQuerySet.as_manager()
+    then: Article.objects.filter(...).stamp('published')"""
+    
+    def stamp(self, field_name):
+        return stamp(self, field_name)
+
+    def unstamp(self, field_name):
+        return unstamp(self, field_name)
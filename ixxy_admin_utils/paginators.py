@@ -0,0 +1,130 @@
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.utils.encoding import force_text
+from django.utils.functional import cached_property
+
+try:
+    from django.core.exceptions import EmptyResultSet
+except ImportError:  # Django < 1.11
+    from django.db.models.sql.datastructures import EmptyResultSet
+
+
+def estimate_count(queryset):
+    """The planner's estimate of the number of rows queryset will return.
+    Only PostgreSQL is supported, returns None for other databases"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    # psycopg2 decodes json columns for us but not every driver does
+    if not isinstance(plan, list):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class ApproximatePage(Page):
+
+    def has_next(self):
+        if not self.paginator.is_approximate:
+            return super(ApproximatePage, self).has_next()
+        # num_pages is only an estimate so look for a row after this page instead
+        top = self.number * self.paginator.per_page
+        return self.paginator.object_list[top:top + 1].exists()
+
+
+class ApproximateCountPaginator(Paginator):
+
+    """Used by ApproximateCountMixin. Counts exactly when the result is small.
+    Above threshold rows it uses the PostgreSQL planner's estimate or, on other databases,
+    a count cached for cache_timeout seconds. is_approximate is True when count isn't exact.
+    Pass exact=True to always count (and refresh the cached count)"""
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True,
+                 threshold=100000, cache_timeout=None, exact=False):
+        super(ApproximateCountPaginator, self).__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.threshold = threshold
+        self.cache_timeout = cache_timeout
+        self.exact = exact
+        self.is_approximate = False
+
+    def _get_cache_key(self):
+        try:
+            sql, params = self.object_list.order_by().query.sql_with_params()
+        except EmptyResultSet:
+            return None
+        return 'ixxy_approximate_count:{}'.format(
+            hashlib.md5(repr((self.object_list.db, sql, params)).encode('utf-8')).hexdigest()
+        )
+
+    def _get_exact_count(self, cache_key):
+        count = super(ApproximateCountPaginator, self).count
+        if cache_key and count >= self.threshold:
+            cache.set(cache_key, count, self.cache_timeout)
+        return count
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return super(ApproximateCountPaginator, self).count
+        cache_key = self._get_cache_key() if self.cache_timeout else None
+        if self.exact:
+            return self._get_exact_count(cache_key)
+        estimate = estimate_count(self.object_list)
+        if estimate is None and cache_key:
+            estimate = cache.get(cache_key)
+        if estimate is None or estimate < self.threshold:
+            return self._get_exact_count(cache_key)
+        self.is_approximate = True
+        return estimate
+
+    def validate_number(self, number):
+        self.count  # Sets is_approximate
+        if not self.is_approximate:
+            return super(ApproximateCountPaginator, self).validate_number(number)
+        # num_pages is a guess so let pages past it through. page() doesn't stop at the estimate either
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.is_approximate:
+            return super(ApproximateCountPaginator, self).page(number)
+        # Don't cut the page short at the estimate, there may be more rows than it says
+        bottom = (number - 1) * self.per_page
+        return ApproximatePage(self.object_list[bottom:bottom + self.per_page], number, self)
+
+
+def encode_keyset_cursor(value, pk):
+    """An opaque url safe token for the position (value, pk) used by KeysetPaginationMixin"""
+    data = json.dumps([
+        value.isoformat() if hasattr(value, 'isoformat') else force_text(value),
+        force_text(pk),
+    ])
+    return force_text(base64.urlsafe_b64encode(data.encode('utf-8'))).rstrip('=')
+
+
+def decode_keyset_cursor(token, field, pk_field):
+    """Returns (value, pk) converted by their model fields. Raises ValueError for a bad token"""
+    try:
+        data = base64.urlsafe_b64decode(str(token + '=' * (-len(token) % 4)))
+        value, pk = json.loads(data.decode('utf-8'))
+        return field.to_python(value), pk_field.to_python(pk)
+    except (TypeError, ValueError, UnicodeDecodeError, ValidationError):
+        raise ValueError('Invalid cursor')
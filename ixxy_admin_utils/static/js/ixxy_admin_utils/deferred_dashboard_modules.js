@@ -0,0 +1,46 @@
+/* Loads the content of dashboard modules created with a deferred_key.
+ * Each module renders a placeholder with the url of its content.
+ * They are all fetched in parallel once the page has loaded.
+ * This script is included once per placeholder so it only runs the first time
+ **/
+
+(function(){
+    if (window.ixxy_deferred_dashboard_modules){
+        return;
+    }
+    window.ixxy_deferred_dashboard_modules = true;
+
+    function load_module(placeholder){
+        var request = new XMLHttpRequest();
+        request.open('GET', placeholder.getAttribute('data-url'));
+        request.onload = function(){
+            var target = placeholder.closest('.dashboard-module-content');
+            if (request.status != 200 || !target){
+                return;
+            }
+            var container = document.createElement('div');
+            container.innerHTML = request.responseText;
+            var content = container.querySelector('.dashboard-module-content');
+            if (content){
+                target.innerHTML = content.innerHTML;
+            } else {
+                // Nothing to show after all
+                placeholder.closest('.dashboard-module').style.display = 'none';
+            }
+        };
+        request.send();
+    }
+
+    function load_all_modules(){
+        var placeholders = document.querySelectorAll('.ixxy-deferred-module[data-url]');
+        for (var i = 0; i < placeholders.length; i++){
+            load_module(placeholders[i]);
+        }
+    }
+
+    if (document.readyState == 'loading'){
+        document.addEventListener('DOMContentLoaded', load_all_modules);
+    } else {
+        load_all_modules();
+    }
+})();
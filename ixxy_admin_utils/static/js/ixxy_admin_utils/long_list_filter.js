@@ -1,26 +1,8 @@
-/* To use this script, simply add the script and dependencies to the Media
- * defination of ModelAdmin:
+/* Used by LongListFilterMixin which wraps each list_filter in a div like:
 
-class UserAccessAggregateOptions(admin.ModelAdmin):
-    list_display = ...
-    list_filter = ...
-    class Media:
-        js = [
-            'https://ajax.googleapis.com/ajax/libs/jqueryui/1.11.4/jquery-ui.min.js',
-            '{}}js/admin_fix_long_list_filter.js?show=active'.format(settings.MEDIA_URL),
-        ]
-        css = {'all': 'https://ajax.googleapis.com/ajax/libs/jqueryui/1.11.4/themes/smoothness/jquery-ui.css'}
+<div class="long-list-filter" data-show="active" data-threshold="300" data-height="100">
 
-
- * Options:
- * You can pass in options to the script
-
-    class Media:
-        js = map (lambda p: settings.STATIC_URL+"js/"+p, (
-            'long_list_filter.js?show=all&height=200',
-        ))
- *
- * Available options:
+ * Options (set as long_list_filter_show etc. on the ModelAdmin):
  * threshold: when a list_filter is taller than {{ threshold }}, the script will
  *   will be applied on it. default is 300
  * show: choices are "all", "none" and "active", default is active
@@ -29,108 +11,145 @@ class UserAccessAggregateOptions(admin.ModelAdmin):
  *   active means only the "All" and selected option will show up
  * height: If you set show=all, we'll set the heighth of the list_filter to
  *   {{ height }}, default is 100
+ *
+ * Filters rendered by LazyRelatedFieldListFilter have no options to hide.
+ * Their input fetches matching choices from the url in the list's data-url attribute
+ * a page at a time. When there are more, picking the last option fetches the next page
+ *
+ * The autocomplete is a plain <datalist> so there's nothing to load besides the admin's own jQuery
  **/
 
-jQuery(document).ready(function($) {
-    function get_query_variable(variable) {
-        var query = '';
-        $('script').each(function(){
-            if (!query){
-                var src = $(this).attr('src');
-                if (src && src.indexOf('long_list_filter.js') != -1){
-                    query = src.split('?')[1]
-                }
-            }
+(function($) {
+    var input_html = '<div><input id="#id#" list="#id#_options" placeholder="Start typing..." class="long-list-filter-input"><datalist id="#id#_options"></datalist></div>';
+
+    function add_input(ul, input_id){
+        ul.before(input_html.replace(/#id#/g, input_id));
+        return $('#' + input_id).css('margin-left', '10px');
+    }
+
+    function set_options(input_id, labels){
+        var datalist = $('#' + input_id + '_options').empty();
+        $.each(labels, function(i, label){
+            datalist.append($('<option>').attr('value', label));
         });
-        if (query){
-            var vars = query.split("&");
-            for (var i=0;i<vars.length;i++) {
-                var pair = vars[i].split("=");
-                if (pair[0] == variable) {
-                    return pair[1];
-                }
-            }
-        }
-        return null;
     }
-    var base_selector = 'long_list_filter_#num#';
-    var base_ul_selector = 'long_list_filter_ul_#num#';
-    var HEIGHT = get_query_variable('height') || 100;
-    var THRESHOLD = get_query_variable('threshold') || 300;
-    var SHOW = get_query_variable('show') || 'active'; //  all or active or none
-    
-    $('ul', '#changelist-filter').each(function(n){
-        if ($(this).height() > THRESHOLD){
-            var ul = $(this);
-            
-            if (SHOW=='active'){
-                // :gt(0) makes sure All is always displayed
-                $('li', ul).filter(':gt(0)').not('.selected').hide();
-            }
-            if (SHOW=='none'){
-                $('li', ul).filter(':gt(0)').hide();
-            }
-            if (SHOW=='all'){
-                ul.height(HEIGHT)
+
+    function init_long_list_filter(wrapper, n){
+        var ul = $('ul', wrapper).not('.long-list-filter-lazy');
+        if (!ul.length || ul.height() <= (wrapper.data('threshold') || 300)){
+            return;
+        }
+        var show = wrapper.data('show') || 'active';
+        if (show == 'active'){
+            // :gt(0) makes sure All is always displayed
+            $('li', ul).filter(':gt(0)').not('.selected').hide();
+        }
+        if (show == 'none'){
+            $('li', ul).filter(':gt(0)').hide();
+        }
+        if (show == 'all'){
+            ul.height(wrapper.data('height') || 100);
+        }
+        ul.css({'overflow-y':'auto', 'overflow-x':'hidden', 'list-style':'none'});
+
+        var links = {};
+        $('li', ul).each(function(){
+            var label = $.trim($(this).text());
+            links[label] = $('a', this).attr('href');
+            $(this).attr('title', 'Click to remove');
+        });
+        $('li', ul).first().attr('title', 'Clear this filter');
+
+        var input_id = 'long_list_filter_' + n;
+        set_options(input_id, Object.keys(links));
+        add_input(ul, input_id).on('change', function(){
+            var href = links[$(this).val()];
+            if (href){
+                location.href = href;
             }
+        });
+    }
 
-            $(this).css({'overflow-y':'auto', 'overflow-x':'hidden', 'list-style':'none'});
-            $('li', this).each(function(){
-                $(this).attr('title', $.trim($(this).text()));
-            });
-            var current_selector = base_selector.replace('#num#', n);
-            var current_ul_selector = base_ul_selector.replace('#num#', n);
-            $(this).attr('id', current_ul_selector);
-            $(this).before(
-                '<div><input id="#id#" placeholder="Start typing..." class="long-list-filter-input"></div>'.replace('#id#', current_selector)
-            );
-            $('#' + current_selector).css('margin-left','10px');
-            var items = $('li', this);
-            var availableOptions = [];
-            items.each(function(){
-                var val = $.trim($(this).text());
-                availableOptions.push(val)
-            });
-            $('li', this).attr('title', 'Click to remove').first().attr('title', 'Clear this filter');;
-            
-            $('li', this).tooltip();
-            
-            var ac = $("#" + current_selector).autocomplete({
-                source: availableOptions,
-                position: {collision: "fit none"},
-                minLength: 0,
-                select: function(event, ui){
-                    var value_slected = ui.item.value;
-                    $('li', '#' + current_ul_selector).each(function(){
-                        if($.trim($(this).text())==value_slected){
-                            location.href = $('a', $(this)).attr('href')
-                        }
-                    })
-                },
-                open: function(){
-                    $(this).autocomplete('widget').css('z-index', 100000);
-                    return false;
+    function init_lazy_filter(ul, n){
+        var input_id = 'long_list_filter_lazy_' + n;
+        var more_label = 'More results...';
+        var choices = {};
+        var term = '';
+        var page = 1;
+        var timeout = null;
+        var input = add_input(ul, input_id);
+
+        function fetch_choices(page_number){
+            var requested_term = term;
+            $.getJSON(ul.data('url'), {q: requested_term, page: page_number}, function(data){
+                // Ignore replies for a term the user has since typed past
+                if (requested_term != term){
+                    return;
+                }
+                if (page_number == 1){
+                    choices = {};
                 }
+                page = page_number;
+                $.each(data.results, function(i, result){
+                    choices[result.text] = result.value;
+                });
+                var labels = Object.keys(choices);
+                if (data.more){
+                    labels.push(more_label);
+                }
+                set_options(input_id, labels);
             });
+        }
 
+        input.on('input', function(){
+            var value = $(this).val();
+            if (value == more_label){
+                // Picking the last option fetches the next page of matches
+                $(this).val(term);
+                fetch_choices(page + 1);
+                return;
+            }
+            if (choices[value] !== undefined){
+                location.href = lazy_filter_url(ul.data('param'), choices[value], ul.data('param-isnull'));
+                return;
+            }
+            clearTimeout(timeout);
+            timeout = setTimeout(function(){
+                term = value;
+                fetch_choices(1);
+            }, 250);
+        });
+    }
 
-        }
-    });
+    function lazy_filter_url(param, value, param_isnull){
+        // Keep the other filters but drop this one and the page number
+        var params = $.grep(location.search.replace(/^\?/, '').split('&'), function(pair){
+            var key = decodeURIComponent(pair.split('=')[0]);
+            return pair && key != param && key != param_isnull && key != 'p';
+        });
+        params.push(encodeURIComponent(param) + '=' + encodeURIComponent(value));
+        return '?' + params.join('&');
+    }
 
-    sync_display_of_input();
-    //We need to toggle the inputs as "show/hide" is clicked
-    $('h2', '#changelist-filter').click(function(){
-        setTimeout('sync_display_of_input()', 100);
-        setTimeout('sync_display_of_input()', 200);
-        setTimeout('sync_display_of_input()', 300);
-        setTimeout('sync_display_of_input()', 400);
-        setTimeout('sync_display_of_input()', 500);
-        setTimeout('sync_display_of_input()', 1000);
-    })
+    function sync_display_of_input(){
+        var display = $('h3', '#changelist-filter').css('display');
+        $('.long-list-filter-input').css('display', display);
+    }
 
-});
+    $(document).ready(function(){
+        $('.long-list-filter', '#changelist-filter').each(function(n){
+            init_long_list_filter($(this), n);
+        });
+        $('ul.long-list-filter-lazy', '#changelist-filter').each(function(n){
+            init_lazy_filter($(this), n);
+        });
 
-function sync_display_of_input(){
-    var display = $('h3', '#changelist-filter').css('display');
-    $('.long-list-filter-input').css('display', display)
-}
+        sync_display_of_input();
+        //We need to toggle the inputs as "show/hide" is clicked
+        $('h2', '#changelist-filter').click(function(){
+            $.each([100, 200, 300, 400, 500, 1000], function(i, delay){
+                setTimeout(sync_display_of_input, delay);
+            });
+        });
+    });
+})(window.django && django.jQuery ? django.jQuery : jQuery);
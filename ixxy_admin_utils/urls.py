@@ -0,0 +1,30 @@
+from django.apps import apps
+from django.conf.urls import url
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from .instrumentation import get_instrumentation_stats
+
+
+# Defined here rather than in instrumentation so the modules using @instrumented don't import the admin
+@staff_member_required
+def instrumentation_stats_view(request):
+    return JsonResponse({'stats': get_instrumentation_stats()})
+
+
+urlpatterns = [
+    url(
+        r'^instrumentation/$',
+        instrumentation_stats_view,
+        name='ixxy_instrumentation_stats',
+    ),
+]
+
+# Only import the dashboard modules, and admin_tools, when they can be used
+if apps.is_installed('admin_tools.dashboard'):
+    from .dashboard_modules import deferred_dashboard_module_view
+    urlpatterns.append(url(
+        r'^dashboard-modules/(?P<key>[\w-]+)/$',
+        deferred_dashboard_module_view,
+        name='ixxy_deferred_dashboard_module',
+    ))